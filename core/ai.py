@@ -1,21 +1,43 @@
-import openai
 import json
+import os
+import random
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from core.config import CONFIG, MOCK_MODE
+from core.client import CLIENTS
+from core.cache import VERDICT_CACHE
+from core.titles import canonicalize
+from core.matcher import KeywordMatcher
+from core.classifier import CLASSIFIER
+from core.profiles import PROFILE_STORE
+from core.rules import RULES
+
+# 系统级白名单，进程启动时编译一次
+SYSTEM_MATCHER = KeywordMatcher(["explorer", "searchapp", "context menu", "新标签页", "new tab", "task switcher"])
 
 class AIGuardian:
     def __init__(self):
-        self.client = None
-        self.reload_client()
         self.current_profile = None 
+        self.profile_matcher = None
+        self.local = threading.local()  # 判定在多个工作线程中并发执行，置信度按线程记录
+
+    @property
+    def last_confidence(self):
+        """当前线程最近一次 judge 的置信度，None 表示没有给出结论 (加载中/接口失败)"""
+        return getattr(self.local, "confidence", None)
+
+    @last_confidence.setter
+    def last_confidence(self, value):
+        self.local.confidence = value
+
+    @property
+    def client(self):
+        # 所有实例共享同一个连接池，见 core/client.py
+        return CLIENTS.get()
 
     def reload_client(self):
-        api_key = CONFIG.get("api_key")
-        base_url = CONFIG.get("base_url")
-        if not MOCK_MODE and api_key:
-            self.client = openai.OpenAI(api_key=api_key, base_url=base_url)
-        else:
-            self.client = None
+        CLIENTS.reload()
 
     def smart_planner(self, user_goal):
         if MOCK_MODE or not self.client:
@@ -33,12 +55,32 @@ class AIGuardian:
             return data.get("tasks", data.get("steps", []))
         except: return []
 
+    def set_profile(self, profile):
+        """设置当前画像，并把 allowed_tools + keywords 编译为匹配器"""
+        # 先编译匹配器再替换画像，judge 不会读到新画像配旧匹配器
+        self.profile_matcher = KeywordMatcher(list(profile.get("allowed_tools") or []) + list(profile.get("keywords") or []))
+        self.current_profile = profile
+
     def create_task_profile(self, main_goal, sub_goal):
-        """为当前任务创建一个详细的分析画像，包括允许的工具、关键词和可能用到的资源类别"""
+        """为当前任务创建画像并设为当前画像"""
+        self.set_profile(self.build_task_profile(main_goal, sub_goal))
+
+    def build_task_profile(self, main_goal, sub_goal):
+        """获取任务画像：优先复用画像库中相同或相似任务的画像，否则请求 LLM 生成"""
         if MOCK_MODE or not self.client:
-            self.current_profile = {"allowed_tools": ["python", "vscode"], "keywords": ["code"], "categories": ["programming"]}
-            return
-        
+            return {"allowed_tools": ["python", "vscode"], "keywords": ["code"], "categories": ["programming"]}
+
+        hit = PROFILE_STORE.lookup(main_goal, sub_goal)
+        if hit:
+            profile, exact = hit
+            # 相似命中先用着，后台再为这个任务生成专属画像，下次即可精确命中
+            if not exact and CONFIG.get("profile_refresh"):
+                threading.Thread(target=self._request_profile, args=(main_goal, sub_goal), daemon=True).start()
+            return profile
+        return self._request_profile(main_goal, sub_goal) or {"allowed_tools": [], "keywords": [], "categories": []}
+
+    def _request_profile(self, main_goal, sub_goal):
+        """为任务生成一个详细的分析画像，包括允许的工具、关键词和可能用到的资源类别；失败返回 None"""
         prompt = f"""
         任务背景：
         总目标："{main_goal}"
@@ -55,26 +97,110 @@ class AIGuardian:
         """
         try:
             res = self.client.chat.completions.create(model=CONFIG.get("model"), messages=[{"role": "user", "content": prompt}], temperature=0.2, response_format={"type": "json_object"})
-            self.current_profile = json.loads(res.choices[0].message.content)
+            profile = json.loads(res.choices[0].message.content)
+            PROFILE_STORE.save(main_goal, sub_goal, profile)
+            return profile
         except: 
-            self.current_profile = {"allowed_tools": [], "keywords": [], "categories": []}
+            return None
+
+    def build_task_profiles(self, main_goal, sub_goals):
+        """
+        规划完成后一次性为所有步骤生成画像，返回与 sub_goals 一一对应的列表。
+        优先用一次批量请求；失败或数量对不上时退回为逐个步骤并行请求。
+        """
+        if not sub_goals: return []
+        if MOCK_MODE or not self.client:
+            return [self.build_task_profile(main_goal, s) for s in sub_goals]
+
+        # 画像库中精确命中的直接复用，只为剩下的步骤发起请求
+        results = [None] * len(sub_goals)
+        for i, s in enumerate(sub_goals):
+            hit = PROFILE_STORE.lookup(main_goal, s)
+            if hit and hit[1]: results[i] = hit[0]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if not missing: return results
 
-    def judge(self, main_goal, sub_goal, active_window, process_name):
-        if not self.current_profile: return False, "加载中..."
+        steps = "\n".join(f"{n+1}. {sub_goals[i]}" for n, i in enumerate(missing))
+        prompt = f"""
+        任务背景：
+        总目标："{main_goal}"
+        子任务列表：
+{steps}
         
-        txt = (active_window + " " + process_name).lower()
+        请按顺序为每个子任务生成一个监控画像：
+        - 允许的工具/应用名 (allowed_tools)
+        - 相关的核心关键词 (keywords)
+        - 相关的活动类别 (categories) - 比如：搜索、查阅文档、编码、设计等
+        
+        提示：Antigravity 是 Google 的编程工具。
+
+        JSON格式：{{ "profiles": [ {{ "allowed_tools": [], "keywords": [], "categories": [] }} ] }}
+        """
+        try:
+            res = self.client.chat.completions.create(model=CONFIG.get("model"), messages=[{"role": "user", "content": prompt}], temperature=0.2, response_format={"type": "json_object"})
+            profiles = json.loads(res.choices[0].message.content).get("profiles", [])
+            if len(profiles) == len(missing) and all(isinstance(p, dict) for p in profiles):
+                for i, profile in zip(missing, profiles):
+                    PROFILE_STORE.save(main_goal, sub_goals[i], profile)
+                    results[i] = profile
+                return results
+        except Exception as e:
+            print(f"Batch profile error: {e}")
+        with ThreadPoolExecutor(max_workers=min(4, len(missing))) as pool:
+            for i, profile in zip(missing, pool.map(lambda i: self.build_task_profile(main_goal, sub_goals[i]), missing)):
+                results[i] = profile
+        return results
+
+    def quick_judge(self, main_goal, sub_goal, active_window, process_name, exe=""):
+        """
+        不需要模型的判定：用户规则、系统白名单、画像匹配，返回 (是否分心, 原因)。
+        开销很小，监督线程对每个新窗口立即调用；需要模型判定 (或画像尚未加载) 时返回 None。
+        """
+        # 0. 用户规则 (一键放行/屏蔽) 优先于一切判定
+        rule = RULES.match(main_goal, sub_goal, active_window, process_name, exe)
+        if rule:
+            if rule.action == "block": return True, f"已屏蔽: {rule.pattern}"
+            return False, f"User Rule: {rule.pattern}"
+        if not self.current_profile: return None
+
+        # 可执行文件名一起参与匹配 (如进程名为 "Electron" 但路径为 .../Obsidian)
+        txt = (active_window + " " + process_name + " " + os.path.basename(exe or "")).lower()
         
         # 1. 快速系统白名单
-        sys_white = ["explorer", "searchapp", "context menu", "新标签页", "new tab", "task switcher"]
-        if any(s in txt for s in sys_white): return False, "System"
+        if SYSTEM_MATCHER.search(txt): return False, "System"
         
-        # 2. 快速画像匹配 (减少不必要的LLM调用)
-        for w in self.current_profile.get("allowed_tools", []) + self.current_profile.get("keywords", []):
-            if w.lower() in txt: return False, f"Matched Profile: {w}"
+        # 2. 快速画像匹配 (减少不必要的LLM调用)，单次扫描标题
+        w = self.profile_matcher.search(txt) if self.profile_matcher else None
+        if w: return False, f"Matched Profile: {w}"
+        return None
+
+    def judge(self, main_goal, sub_goal, active_window, process_name, exe=""):
+        # 规则/画像/缓存命中都是确定结论，其余分支各自覆盖
+        self.last_confidence = 1.0
+        verdict = self.quick_judge(main_goal, sub_goal, active_window, process_name, exe)
+        if verdict: return verdict
+
+        if not self.current_profile:
+            self.last_confidence = None
+            return False, "加载中..."
+        txt = (active_window + " " + process_name + " " + os.path.basename(exe or "")).lower()
             
         if MOCK_MODE or not self.client: return True, "[模拟] 异常"
+
+        # 3. 判定缓存 (同一子任务下相同窗口直接复用之前的结论，标题先归一化)
+        canon_title = canonicalize(active_window, process_name)
+        cached = VERDICT_CACHE.get(sub_goal, canon_title, process_name)
+        if cached: return cached
+
+        # 4. 本地分类器：置信度足够高时直接给出结论，不再请求 API
+        # 按 classifier_audit_rate 抽样仍交给 LLM，分类器从它的结论中继续学习 (并校准自己的置信度)
+        if CLASSIFIER.ready() and random.random() >= CONFIG.get("classifier_audit_rate"):
+            p = CLASSIFIER.predict(sub_goal, canon_title, process_name)
+            if max(p, 1 - p) >= CONFIG.get("classifier_threshold"):
+                self.last_confidence = max(p, 1 - p)
+                return (True, "[本地] 又溜号了吧") if p >= 0.5 else (False, "[本地] 专注中")
         
-        # 3. 深度AI判定
+        # 5. 深度AI判定
         prompt = f"""
 你是一个专业的高级专注力审计员。你的目标是基于用户的具体任务上下文，判断用户的当前窗口是否真正处于工作状态。
 
@@ -99,24 +225,53 @@ class AIGuardian:
 }}
 
 """
-        try:
-            res = self.client.chat.completions.create(
-                model=CONFIG.get("model"), 
-                messages=[{"role": "user", "content": prompt}], 
-                max_tokens=100, 
-                temperature=0.5,  # 降低温度以获得更一致的判断
-                response_format={"type": "json_object"}
-            )
-            data = json.loads(res.choices[0].message.content)
-            is_distracted = data.get("is_distracted", False)
-            reason = data.get("reason", "注意力分散")
+        # 分级判定：先用快速/本地模型，置信度不足时再升级到下一级，最后一级为 CONFIG["model"]
+        tiers = list(CONFIG.get("cascade_tiers") or []) + [{"model": CONFIG.get("model")}]
+        threshold = CONFIG.get("cascade_threshold")
+        verdict = None
+        for tier in tiers:
+            try:
+                verdict = self._ask_judge(tier, prompt)
+            except Exception as e:
+                print(f"Judge tier {tier.get('model')} failed: {e}")
+                continue
+            if verdict[2] >= threshold:
+                break
+
+        if verdict:
+            is_distracted, reason, confidence = verdict
+            self.last_confidence = confidence
+            VERDICT_CACHE.put(sub_goal, canon_title, process_name, is_distracted, reason)
+            CLASSIFIER.learn(sub_goal, canon_title, process_name, is_distracted)
             return is_distracted, reason
-        except Exception as e:
-            # 降级处理：如果API调用失败，使用简单规则判断
-            distraction_keywords = ["video", "game", "social", "shopping", "娱乐", "游戏", "视频", "购物", "社交"]
-            if any(kw in txt for kw in distraction_keywords):
-                return True, "疑似分心"
-            return False, "Err"
+
+        # 降级处理：如果API调用失败，使用简单规则判断
+        self.last_confidence = None
+        distraction_keywords = ["video", "game", "social", "shopping", "娱乐", "游戏", "视频", "购物", "社交"]
+        if any(kw in txt for kw in distraction_keywords):
+            return True, "疑似分心"
+        return False, "Err"
+
+    def _ask_judge(self, tier, prompt):
+        """
+        向某一级模型请求判定，返回 (is_distracted, reason, confidence)。
+        tier 可单独指定 base_url / api_key (缺省沿用全局设置)，用于接入 OpenAI 兼容的本地服务 (如 Ollama)。
+        """
+        client = CLIENTS.get(tier.get("api_key"), tier.get("base_url"))
+        if not client: raise RuntimeError("client not configured")
+        res = client.chat.completions.create(
+            model=tier.get("model") or CONFIG.get("model"), 
+            messages=[{"role": "user", "content": prompt}], 
+            max_tokens=100, 
+            temperature=0.5,  # 降低温度以获得更一致的判断
+            response_format={"type": "json_object"}
+        )
+        data = json.loads(res.choices[0].message.content)
+        try:
+            confidence = float(data.get("confidence", 0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return data.get("is_distracted", False), data.get("reason", "注意力分散"), confidence
 
     def generate_daily_report(self, tasks, distractions):
         if not tasks: return "今天还没有记录。"
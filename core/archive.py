@@ -0,0 +1,80 @@
+import gzip
+import itertools
+import json
+import os
+from datetime import datetime
+from core import export
+
+# 归档的原始表 (见 core/export.py 的 DATASETS)，汇总表不归档，始终留在数据库中
+ARCHIVED_DATASETS = ("sessions", "distractions", "idle", "timeline")
+
+
+def month_start(ts):
+    d = datetime.fromtimestamp(ts)
+    return datetime(d.year, d.month, 1).timestamp()
+
+
+def next_month(ts):
+    d = datetime.fromtimestamp(ts)
+    return datetime(d.year + (d.month == 12), d.month % 12 + 1, 1).timestamp()
+
+
+def archive_path(directory, dataset, ts):
+    return os.path.join(directory, f"{dataset}-{datetime.fromtimestamp(ts).strftime('%Y-%m')}.jsonl.gz")
+
+
+def archive_before(conn, cutoff_ts, directory):
+    """
+    把 start_ts < cutoff_ts 的原始记录按月追加到 directory/<数据集>-YYYY-MM.jsonl.gz，再从数据库删除。
+    每个 (数据集, 月) 单独提交：先写完并落盘归档文件，再在一个事务中删除对应行。
+    返回 {数据集: 归档行数}。
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for dataset in ARCHIVED_DATASETS:
+        table, ts_col, _ = export.DATASETS[dataset]
+        first = conn.execute(f"SELECT MIN({ts_col}) FROM {table} WHERE {ts_col} < ?", (cutoff_ts,)).fetchone()[0]
+        if first is None: continue
+        start = month_start(first)
+        while start < cutoff_ts:
+            end = min(next_month(start), cutoff_ts)
+            batches = export.iter_batches(conn, dataset, start, end)
+            head = next(batches, None)
+            n = 0
+            if head:
+                # 追加模式会在 gzip 文件中新增一个 member，读取时自动拼接
+                with gzip.open(archive_path(directory, dataset, start), "at", encoding="utf-8") as f:
+                    n = export.write_jsonl(itertools.chain([head], batches), export.columns(dataset), f)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if n:
+                conn.execute(f"DELETE FROM {table} WHERE {ts_col} >= ? AND {ts_col} < ?", (start, end))
+                conn.commit()
+                counts[dataset] = counts.get(dataset, 0) + n
+            start = next_month(start)
+    # 旧的采样分心记录在迁移 3 中已转换为片段，直接删除
+    conn.execute("DELETE FROM distractions WHERE ts < ?", (cutoff_ts,))
+    conn.commit()
+    return counts
+
+
+def read_archive(directory, dataset, start_ts=None, end_ts=None):
+    """按需读取归档：逐行产出 dict (按月份顺序)，只打开与时间范围相交的月份文件"""
+    if dataset not in ARCHIVED_DATASETS: raise ValueError(f"unknown dataset: {dataset}")
+    if not os.path.isdir(directory): return
+    prefix = f"{dataset}-"
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith(prefix) and name.endswith(".jsonl.gz")): continue
+        month = datetime.strptime(name[len(prefix):-len(".jsonl.gz")], "%Y-%m").timestamp()
+        if end_ts is not None and month >= end_ts: continue
+        if start_ts is not None and next_month(month) <= start_ts: continue
+        seen = set()  # 中断后重新归档可能重复追加同一行，按 id 去重
+        with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ts = row.get("start_ts")
+                if start_ts is not None and (ts is None or ts < start_ts): continue
+                if end_ts is not None and (ts is None or ts >= end_ts): continue
+                if row["id"] in seen: continue
+                seen.add(row["id"])
+                yield row
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from core.config import CONFIG
+
+
+def _norm(s):
+    """统一大小写与空白，避免同一窗口因格式差异产生不同的 key"""
+    return " ".join((s or "").lower().split())
+
+
+class VerdictCache:
+    """
+    judge 结果的两级缓存：
+    1. 进程内 LRU (OrderedDict)，命中耗时微秒级
+    2. flowmate.db 中的 verdict_cache 表，重启后依然有效
+    每条记录带有独立的过期时间 (TTL)。
+    """
+    def __init__(self, db_name="flowmate.db", max_size=None, ttl=None):
+        self.db_name = db_name
+        self.max_size = max_size or CONFIG.get("verdict_cache_size")
+        self.ttl = ttl or CONFIG.get("verdict_cache_ttl")
+        self.memory = OrderedDict()  # key -> (expires_at, is_distracted, reason)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _get_conn(self):
+        # 延迟打开连接，避免 import 时就触碰数据库文件
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS verdict_cache (cache_key TEXT PRIMARY KEY, is_distracted INTEGER, reason TEXT, expires_at REAL)''')
+            self.conn.execute("DELETE FROM verdict_cache WHERE expires_at < ?", (time.time(),))
+            self.conn.commit()
+        return self.conn
+
+    @staticmethod
+    def make_key(sub_goal, title, process):
+        return "\x1f".join((_norm(sub_goal), _norm(title), _norm(process)))
+
+    def get(self, sub_goal, title, process):
+        """返回 (is_distracted, reason)，未命中或已过期返回 None"""
+        key = self.make_key(sub_goal, title, process)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry:
+                if entry[0] >= now:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], entry[2]
+                del self.memory[key]
+
+            try:
+                row = self._get_conn().execute(
+                    "SELECT is_distracted, reason, expires_at FROM verdict_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Verdict cache read error: {e}")
+                row = None
+
+            if row and row[2] >= now:
+                # 回填到内存层
+                self._put_memory(key, (row[2], bool(row[0]), row[1]))
+                self.db_hits += 1
+                return bool(row[0]), row[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, sub_goal, title, process, is_distracted, reason):
+        key = self.make_key(sub_goal, title, process)
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._put_memory(key, (expires_at, bool(is_distracted), reason))
+            try:
+                conn = self._get_conn()
+                conn.execute("INSERT OR REPLACE INTO verdict_cache (cache_key, is_distracted, reason, expires_at) VALUES (?, ?, ?, ?)",
+                             (key, int(bool(is_distracted)), reason, expires_at))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Verdict cache write error: {e}")
+
+    def _put_memory(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        """命中统计，用于调整缓存大小和 TTL"""
+        with self.lock:
+            total = self.hits + self.db_hits + self.misses
+            return {
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.db_hits) / total if total else 0.0,
+                "size": len(self.memory),
+            }
+
+
+# Singleton instance
+VERDICT_CACHE = VerdictCache()
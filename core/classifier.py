@@ -0,0 +1,200 @@
+import io
+import sqlite3
+import threading
+import zlib
+from collections import deque
+from core.config import CONFIG
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("Warning: local distraction classifier requires numpy. Install with: pip install numpy")
+
+N_FEATURES = 1 << 16
+NGRAM_RANGE = (2, 4)
+ALPHA = 0.5           # 拉普拉斯平滑
+SAVE_EVERY = 20       # 每学习 N 条样本持久化一次
+CALIB_SIZE = 500      # 用于校准的最近 (原始分数, 标签) 对
+CALIB_MIN = 30        # 校准样本不足时不给出有把握的结论
+_PRIME = 1000003
+
+
+def _goal_salt(sub_goal):
+    return zlib.crc32(" ".join((sub_goal or "").lower().split()).encode("utf-8"))
+
+
+def _features(sub_goal, title, process):
+    """
+    哈希字符 n-gram 特征 (NumPy 向量化滚动哈希)。
+    同一组 n-gram 会生成两份：通用特征 + 与子任务绑定的特征，
+    这样"YouTube"在"看教程"和"写周报"下可以学到不同的结论。
+    """
+    text = f" {title} | {process} ".lower()
+    codes = np.fromiter(map(ord, text), dtype=np.uint64, count=len(text))
+    parts = []
+    for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+        if len(codes) < n: break
+        h = np.full(len(codes) - n + 1, n, dtype=np.uint64)
+        for i in range(n):
+            h = h * np.uint64(_PRIME) + codes[i:len(codes) - n + 1 + i]
+        parts.append(h)
+    if not parts:
+        return np.zeros(0, dtype=np.int64)
+    h = np.concatenate(parts)
+    mask = np.uint64(N_FEATURES - 1)
+    generic = h & mask
+    scoped = (h ^ np.uint64(_goal_salt(sub_goal))) * np.uint64(_PRIME) & mask
+    return np.unique(np.concatenate([generic, scoped])).astype(np.int64)
+
+
+class DistractionClassifier:
+    """
+    本地增量训练的朴素贝叶斯分心分类器。
+    训练数据来自 LLM 的判定结果与用户纠正，模型状态保存在 flowmate.db 的 classifier_state 表。
+    朴素贝叶斯的原始概率极端 (几百个 n-gram 被当作独立证据)，不能直接当置信度用：
+    每条样本在学习前先用当前模型打分，(分数, 标签) 即为留出数据，用于 Platt 校准；
+    校准后的概率再按标题特征在训练中出现过的比例向 0.5 收缩，没见过的窗口不会被高置信度判定。
+    """
+    def __init__(self, db_name="flowmate.db"):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.conn = None
+        self.loaded = False
+        self.pending = 0
+        if NUMPY_AVAILABLE:
+            self.counts = np.zeros((2, N_FEATURES), dtype=np.float32)  # [专注, 分心] 的特征计数
+            self.totals = np.zeros(2, dtype=np.float64)
+            self.docs = np.zeros(2, dtype=np.float64)
+            self.calib = deque(maxlen=CALIB_SIZE)  # (原始对数几率, 标签)
+            self.platt = None  # 校准参数 (a, b)，None 表示需要重新拟合
+
+    def _get_conn(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS classifier_state (name TEXT PRIMARY KEY, data BLOB)''')
+            self.conn.commit()
+        return self.conn
+
+    def _ensure_loaded(self):
+        # 延迟加载：首次使用时读取模型，没有已保存的模型则用历史数据冷启动
+        if self.loaded: return
+        self.loaded = True
+        try:
+            row = self._get_conn().execute("SELECT data FROM classifier_state WHERE name = 'nb'").fetchone()
+            if row:
+                data = np.load(io.BytesIO(row[0]))
+                self.counts, self.totals, self.docs = data["counts"], data["totals"], data["docs"]
+                if "calib" in data.files:  # 旧版本保存的模型没有校准数据
+                    self.calib.extend(map(tuple, data["calib"].tolist()))
+            else:
+                self._bootstrap()
+        except (sqlite3.Error, ValueError, KeyError) as e:
+            print(f"Classifier load error: {e}")
+
+    def _bootstrap(self):
+        """用 verdict_cache 中的 LLM 判定和 distractions 中的分心记录训练初始模型"""
+        conn = self._get_conn()
+        try:
+            for key, is_d in conn.execute("SELECT cache_key, is_distracted FROM verdict_cache"):
+                sub_goal, title, process = (key.split("\x1f") + ["", "", ""])[:3]
+                self._fit(sub_goal, title, process, bool(is_d), 1.0)
+        except sqlite3.Error:
+            pass  # 缓存表尚未创建
+        try:
+            rows = conn.execute("SELECT s.task_name, d.app_name FROM distractions d JOIN sessions s ON d.session_id = s.id")
+            for task_name, app_name in rows:
+                self._fit(task_name, "", app_name or "", True, 1.0)
+        except sqlite3.Error:
+            pass
+        if self.docs.sum() > 0:
+            self._save()
+
+    def _fit(self, sub_goal, title, process, is_distracted, weight):
+        idx = _features(sub_goal, title, process)
+        label = int(bool(is_distracted))
+        if self.docs.min() > 0:
+            # 学习前先打分：模型还没见过这条样本，相当于留出验证
+            self.calib.append((self._score(idx), label))
+            self.platt = None
+        self.counts[label, idx] += weight
+        self.totals[label] += weight * len(idx)
+        self.docs[label] += weight
+
+    def _save(self):
+        buf = io.BytesIO()
+        np.savez_compressed(buf, counts=self.counts, totals=self.totals, docs=self.docs,
+                            calib=np.array(self.calib, dtype=np.float64).reshape(-1, 2))
+        try:
+            conn = self._get_conn()
+            conn.execute("INSERT OR REPLACE INTO classifier_state (name, data) VALUES ('nb', ?)", (buf.getvalue(),))
+            conn.commit()
+            self.pending = 0
+        except sqlite3.Error as e:
+            print(f"Classifier save error: {e}")
+
+    def learn(self, sub_goal, title, process, is_distracted, weight=1.0):
+        """增量学习一条样本；用户纠正可传入更大的 weight"""
+        if not NUMPY_AVAILABLE: return
+        with self.lock:
+            self._ensure_loaded()
+            self._fit(sub_goal, title, process, is_distracted, weight)
+            self.pending += 1
+            if self.pending >= SAVE_EVERY:
+                self._save()
+
+    def ready(self):
+        """样本足够且两类都见过时才参与判定"""
+        if not NUMPY_AVAILABLE: return False
+        with self.lock:
+            self._ensure_loaded()
+            return self.docs.sum() >= CONFIG.get("classifier_min_samples") and self.docs.min() >= 5
+
+    def _score(self, idx):
+        """朴素贝叶斯的原始对数几率 log P(分心) - log P(专注)"""
+        log_prior = np.log(self.docs + 1) - np.log(self.docs.sum() + 2)
+        log_norm = np.log(self.totals + ALPHA * N_FEATURES)
+        scores = log_prior + (np.log(self.counts[:, idx] + ALPHA).sum(axis=1) - log_norm * len(idx))
+        return float(np.clip(scores[1] - scores[0], -50, 50))
+
+    def _fit_platt(self):
+        """在留出的 (分数, 标签) 上拟合 sigmoid(a * s + b)，牛顿法，目标值按 Platt 的方法平滑"""
+        data = np.array(self.calib, dtype=np.float64)
+        s, y = data[:, 0], data[:, 1]
+        pos = y.sum()
+        neg = len(y) - pos
+        t = np.where(y > 0, (pos + 1) / (pos + 2), 1 / (neg + 2))
+        a, b = 0.0, float(np.log((pos + 1) / (neg + 1)))
+        for _ in range(50):
+            p = 1.0 / (1.0 + np.exp(-np.clip(a * s + b, -50, 50)))
+            w = p * (1 - p) + 1e-9
+            g = np.array([((p - t) * s).sum(), (p - t).sum()])
+            h = np.array([[(w * s * s).sum() + 1e-6, (w * s).sum()], [(w * s).sum(), w.sum() + 1e-6]])
+            step = np.linalg.solve(h, g)
+            a, b = a - step[0], b - step[1]
+            if np.abs(step).max() < 1e-6: break
+        self.platt = (a, b)
+
+    def predict(self, sub_goal, title, process):
+        """返回校准后的分心概率 (0-1)，越接近 0.5 越没有把握"""
+        idx = _features(sub_goal, title, process)
+        if len(idx) == 0: return 0.5
+        with self.lock:
+            labels = [y for _, y in self.calib]
+            if len(labels) < CALIB_MIN or min(labels) == max(labels): return 0.5
+            if self.platt is None: self._fit_platt()
+            a, b = self.platt
+            p = 1.0 / (1.0 + np.exp(-np.clip(a * self._score(idx) + b, -50, 50)))
+            # 训练中出现过的特征占比，完全陌生的窗口收缩到 0.5
+            coverage = np.count_nonzero(self.counts[:, idx].sum(axis=0)) / len(idx)
+        return float(0.5 + (p - 0.5) * coverage)
+
+    def flush(self):
+        if not NUMPY_AVAILABLE: return
+        with self.lock:
+            if self.pending: self._save()
+
+
+# Singleton instance
+CLASSIFIER = DistractionClassifier()
@@ -0,0 +1,55 @@
+import threading
+import httpx
+import openai
+from core.config import CONFIG, MOCK_MODE
+
+# HTTP/2 需要额外安装 h2 (pip install httpx[http2])，没有时退回 HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_SUPPORTED = True
+except ImportError:
+    HTTP2_SUPPORTED = False
+
+
+class ClientRegistry:
+    """
+    进程级共享的 OpenAI client 注册表。
+    所有 AIGuardian 实例复用同一组 HTTP 连接池，避免每次切换步骤都重新握手。
+    按 (api_key, base_url) 区分，方便不同服务商共存。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = {}
+
+    def _build(self, api_key, base_url):
+        http_client = openai.DefaultHttpxClient(
+            http2=HTTP2_SUPPORTED,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=120),
+            timeout=httpx.Timeout(CONFIG.get("http_timeout"), connect=CONFIG.get("http_connect_timeout")),
+        )
+        return openai.OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=1)
+
+    def get(self, api_key=None, base_url=None):
+        """返回共享 client；未配置 API Key 或处于模拟模式时返回 None"""
+        api_key = api_key if api_key is not None else CONFIG.get("api_key")
+        base_url = base_url if base_url is not None else CONFIG.get("base_url")
+        if MOCK_MODE or not api_key:
+            return None
+        key = (api_key, base_url)
+        client = self.clients.get(key)
+        if client is None:
+            with self.lock:
+                client = self.clients.get(key)
+                if client is None:
+                    client = self._build(api_key, base_url)
+                    self.clients = {**self.clients, key: client}
+        return client
+
+    def reload(self):
+        """设置变更后整体替换 client 表。正在进行的请求继续使用旧 client，结束后由旧连接池自行回收"""
+        with self.lock:
+            self.clients = {}
+
+
+# Singleton instance
+CLIENTS = ClientRegistry()
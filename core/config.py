@@ -21,8 +21,42 @@ class ConfigManager:
             "api_key": "",
             "base_url": "https://api.deepseek.com",
             "model": "deepseek-chat",
-            "strict_mode": False
+            "strict_mode": False,
+            # judge 结果缓存 (可在 config.json 中调整)
+            "verdict_cache_size": 512,
+            "verdict_cache_ttl": 3600,
+            # HTTP 超时 (秒)
+            "http_timeout": 20,
+            "http_connect_timeout": 5,
+            # 本地分类器：样本数达到 min_samples 后，置信度高于 threshold 的判定不再请求 API
+            "classifier_min_samples": 50,
+            "classifier_threshold": 0.95,
+            "classifier_audit_rate": 0.1,  # 本地分类器有把握时仍抽样交给 LLM 复核的比例
+            # 分级判定：[{"model": "...", "base_url": "可选", "api_key": "可选"}]，
+            # 依次尝试，置信度 >= cascade_threshold 即采用，最后兜底使用 model
+            "cascade_tiers": [],
+            "cascade_threshold": 0.8,
+            # 后台判定线程数
+            "judge_workers": 2,
+            # 画像库：相似度达到阈值即复用历史画像，并在后台刷新
+            "profile_similarity": 0.6,
+            "profile_refresh": True,
+            # 窗口需在前台停留多久 (毫秒) 才触发判定，alt-tab 途经的窗口不判定
+            "title_dwell_ms": 800,
+            # 在非必要应用上累计停留多久 (秒) 才判定并提醒；离开后按半衰期 (秒) 衰减
+            "alert_dwell_seconds": 60,
+            "dwell_half_life": 300,
+            "dwell_scope": "title",  # "title": 按应用+标题累计, "app": 按应用累计
+            "idle_timeout": 120,  # 无键鼠输入超过该秒数视为离开，暂停采样和判定 (0 为关闭)
+            "sample_interval_min": 0.5,  # 自适应采样间隔下限/上限 (秒)
+            "sample_interval_max": 4,
+            "rejudge_interval_min": 5,  # 同一窗口重新判定的间隔下限/上限 (秒)
+            "rejudge_interval_max": 60,
+            "focusmap_dir": "focusmap",  # 每秒状态图 (热力图数据) 目录
+            "retention_days": 180,  # 原始记录保留天数，更早的移入 archive_dir 的月度压缩归档 (0 为永久保留)
+            "archive_dir": "archive"
         }
+        self.file_keys = set()  # config.json 中出现过的键，保存时一并保留
         self.config = self._load_initial_config()
 
     def _load_initial_config(self) -> dict:
@@ -32,7 +66,9 @@ class ConfigManager:
         if os.path.exists(self.filename):
             try:
                 with open(self.filename, 'r', encoding='utf-8') as f:
-                    config.update(json.load(f))
+                    data = json.load(f)
+                config.update(data)
+                self.file_keys = set(data)
             except Exception as e:
                 print(f"Error loading config.json: {e}")
 
@@ -52,9 +88,10 @@ class ConfigManager:
         """Save settings back to local config.json while maintaining current session state."""
         self.config[key] = value
         
-        # Only persist user-configurable fields
-        persistence_keys = ["api_key", "base_url", "model", "strict_mode"]
+        # Only persist user-configurable fields, plus advanced keys hand-edited into config.json
+        persistence_keys = ["api_key", "base_url", "model", "strict_mode", "alert_dwell_seconds"]
         data_to_save = {k: self.config.get(k) for k in persistence_keys}
+        data_to_save.update({k: self.config.get(k) for k in self.file_keys if k not in data_to_save})
         
         try:
             with open(self.filename, 'w', encoding='utf-8') as f:
@@ -1,42 +1,490 @@
+import os
+import queue
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from core import rollups, export, archive
+from core.config import CONFIG
+
+FLUSH_INTERVAL = 1.0  # 写入最多攒这么多秒再提交一次
+BATCH_SIZE = 200      # 或者攒够这么多条立即提交
+QUEUE_SIZE = 1000     # 写队列上限，写线程跟不上时调用方阻塞而不是无限占用内存
+MAINTENANCE_INTERVAL = 6 * 3600  # 后台归档/整理的最小间隔 (秒)
+
+_STOP = object()
+
+
+def _fmt(ts):
+    """epoch 秒 -> 本地时间文本 (旧的 TEXT 列继续写入，便于直接查看数据库)"""
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def day_range(day=None):
+    """返回某一天 (默认今天) 本地零点到次日零点的 epoch 秒区间 [start, end)"""
+    start = datetime.combine(day or datetime.now().date(), datetime.min.time())
+    return int(start.timestamp()), int((start + timedelta(days=1)).timestamp())
+
+
+# ---------- schema 迁移 ----------
+# MIGRATIONS[i] 把 schema 从版本 i 升级到 i + 1，版本号记录在 PRAGMA user_version。
+# 只能追加新的迁移，不要修改已发布的迁移。
+
+def _migrate_epoch_timestamps(cursor):
+    """时间改为整数 epoch 列并建立索引，报表查询从全表 LIKE 扫描改为范围扫描"""
+    cursor.execute("ALTER TABLE sessions ADD COLUMN start_ts INTEGER")
+    cursor.execute("ALTER TABLE sessions ADD COLUMN end_ts INTEGER")
+    cursor.execute("ALTER TABLE distractions ADD COLUMN ts INTEGER")
+    cursor.execute("ALTER TABLE idle_periods ADD COLUMN start_ts INTEGER")
+    cursor.execute("ALTER TABLE idle_periods ADD COLUMN end_ts INTEGER")
+    # 旧数据的文本时间是本地时间，'utc' 修饰符将其换算为 UTC epoch
+    cursor.execute("UPDATE sessions SET start_ts = CAST(strftime('%s', start_time, 'utc') AS INTEGER), end_ts = CAST(strftime('%s', end_time, 'utc') AS INTEGER)")
+    cursor.execute("UPDATE distractions SET ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)")
+    cursor.execute("UPDATE idle_periods SET start_ts = CAST(strftime('%s', start_time, 'utc') AS INTEGER), end_ts = CAST(strftime('%s', end_time, 'utc') AS INTEGER)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_start_ts ON sessions(start_ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_distractions_ts ON distractions(ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_distractions_session ON distractions(session_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_idle_start_ts ON idle_periods(start_ts)")
+
+
+def _migrate_rollups(cursor):
+    """按天/小时/应用/任务的汇总表，并用已有记录回填"""
+    rollups.create_tables(cursor)
+    rollups.rebuild(cursor)
+
+
+EPISODE_GAP = 15  # 旧的采样记录相隔不超过该秒数时合并为同一个片段
+
+
+def _migrate_episodes(cursor):
+    """分心记录改为片段 (开始/结束/时长)，旧的采样行合并转换后重建汇总"""
+    cursor.execute('''CREATE TABLE distraction_episodes (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, app_name TEXT, title TEXT, reason TEXT, start_ts INTEGER, end_ts INTEGER, duration INTEGER)''')
+    cursor.execute("CREATE INDEX idx_episodes_start_ts ON distraction_episodes(start_ts)")
+    cursor.execute("CREATE INDEX idx_episodes_session ON distraction_episodes(session_id)")
+    cursor.execute("ALTER TABLE sessions ADD COLUMN distraction_seconds INTEGER DEFAULT 0")
+    for table in ("rollup_daily", "rollup_hourly", "rollup_app", "rollup_task"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN distraction_seconds INTEGER DEFAULT 0")
+
+    # 同一会话、同一应用、同一原因的连续采样行合并为一个片段
+    episodes, cur = [], None
+    for session_id, ts, app_name, reason in cursor.execute("SELECT session_id, ts, app_name, reason FROM distractions WHERE ts IS NOT NULL ORDER BY session_id, ts").fetchall():
+        if cur and cur[0] == session_id and cur[1] == app_name and cur[2] == reason and ts - cur[4] <= EPISODE_GAP:
+            cur[4] = ts
+        else:
+            if cur: episodes.append(cur)
+            cur = [session_id, app_name, reason, ts, ts]
+    if cur: episodes.append(cur)
+    cursor.executemany("INSERT INTO distraction_episodes (session_id, app_name, title, reason, start_ts, end_ts, duration) VALUES (?, ?, '', ?, ?, ?, ?)",
+                       [(sid, app, reason, start, end, end - start) for sid, app, reason, start, end in episodes])
+    cursor.execute("""UPDATE sessions SET
+        distraction_count = (SELECT COUNT(*) FROM distraction_episodes e WHERE e.session_id = sessions.id),
+        distraction_seconds = (SELECT COALESCE(SUM(duration), 0) FROM distraction_episodes e WHERE e.session_id = sessions.id)""")
+    rollups.rebuild(cursor)
+
+
+def _migrate_timeline(cursor):
+    """前台活动时间线 (只追加)"""
+    cursor.execute('''CREATE TABLE activity_timeline (id INTEGER PRIMARY KEY AUTOINCREMENT, process TEXT, title TEXT, distracted INTEGER, start_ts REAL, end_ts REAL, duration REAL)''')
+    cursor.execute("CREATE INDEX idx_timeline_start_ts ON activity_timeline(start_ts)")
+
+
+def _migrate_meta(cursor):
+    """键值表：归档分界 (archived_before)、上次维护时间等"""
+    cursor.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+
+
+MIGRATIONS = [
+    _migrate_epoch_timestamps,  # 1
+    _migrate_rollups,           # 2
+    _migrate_episodes,          # 3
+    _migrate_timeline,          # 4
+    _migrate_meta,              # 5
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _get_meta(cursor, key, default=None):
+    row = cursor.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(cursor, key, value):
+    cursor.execute("INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
 
 class DatabaseManager:
+    """
+    会话/分心记录存储。
+    所有写操作投递到专用写线程，按 FLUSH_INTERVAL / BATCH_SIZE 合并为一个事务提交，
+    调用方 (Qt 主线程) 不再等待磁盘 IO；读操作使用各线程自己的连接，WAL 模式下读写互不阻塞。
+    日志都写到 stderr：dbtool export 默认输出到 stdout，不能混进导出的数据。
+    """
     def __init__(self, db_name="flowmate.db"):
-        self.conn = sqlite3.connect(db_name, check_same_thread=False)
+        self.db_name = db_name
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.local = threading.local()
+        self.conn = self._connect()  # 写连接，只在写线程中使用
         self.create_tables()
+        self.migrate()
+        # 会话 id 在本地分配，start_session 无需等待写入完成就能返回 id
+        self.id_lock = threading.Lock()
+        # sqlite_sequence 记录用过的最大 id (AUTOINCREMENT)，行被归档删除后也不会回退，
+        # 新会话不会复用归档中片段/离开记录仍在引用的 id
+        seq = self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'sessions'").fetchone()
+        used = self.conn.execute("SELECT MAX(id) FROM sessions").fetchone()[0]
+        self.next_session_id = max(seq[0] if seq else 0, used or 0) + 1
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+        self.maintainer = None  # 后台维护线程 (见 maintain)
+
+    def _connect(self):
+        # 后台维护提交删除时会短暂持有写锁，其他连接最多等待 30 秒而不是直接报错
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, timeout=30)
+        # 必须在切换 WAL 之前设置：切换日志模式会初始化新数据库，之后再设置 auto_vacuum 不会生效。
+        # 对已有数据库只是记下设置，由 dbtool archive (maintain(force=True)) 中的一次 VACUUM 完成转换
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL 下只在检查点时 fsync
+        return conn
 
     def create_tables(self):
         cursor = self.conn.cursor()
         cursor.execute('''CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, task_name TEXT, start_time TEXT, end_time TEXT, duration_minutes INTEGER, status TEXT, distraction_count INTEGER DEFAULT 0)''')
         cursor.execute('''CREATE TABLE IF NOT EXISTS distractions (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, timestamp TEXT, app_name TEXT, reason TEXT)''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS idle_periods (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, start_time TEXT, end_time TEXT, seconds INTEGER)''')
         self.conn.commit()
 
-    def start_session(self, task_name, duration):
+    def migrate(self):
+        """按 user_version 依次执行尚未应用的迁移，每个迁移在单独的事务中完成"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            print(f"Warning: database schema v{version} is newer than this FlowMate (v{SCHEMA_VERSION})", file=sys.stderr)
+            return
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("BEGIN")
+                MIGRATIONS[target - 1](cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            print(f"Database migrated to schema v{target}", file=sys.stderr)
+
+    # ---------- 写线程 ----------
+
+    def _put(self, item):
+        """放入写队列；队列满时等待，但写线程已退出时不再等待 (否则调用方会永久阻塞)，返回是否成功"""
+        while self.writer.is_alive():
+            try:
+                self.queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        print("Database writer is not running, write dropped", file=sys.stderr)
+        return False
+
+    def _submit(self, op, *args):
+        """投递一个写操作 op(cursor, *args)，不等待执行"""
+        self._put((op, args, None))
+
+    def flush(self, timeout=5):
+        """等待此前投递的所有写操作提交完成 (timeout=None 为一直等待，写线程退出时立即返回)"""
+        done = Future()
+        if not self._put((None, None, done)): return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.done():
+            if not self.writer.is_alive():
+                print("Database flush error: writer thread exited", file=sys.stderr)
+                return
+            wait = 1 if deadline is None else min(1, deadline - time.monotonic())
+            if wait <= 0:
+                print("Database flush error: timed out", file=sys.stderr)
+                return
+            try:
+                done.result(wait)
+            except FutureTimeout:
+                continue
+            except Exception as e:
+                print(f"Database flush error: {e}", file=sys.stderr)
+                return
+
+    def close(self):
+        """提交剩余写入并停止写线程"""
+        if self.maintainer and self.maintainer.is_alive():
+            self.maintainer.join(30)  # 归档按月提交，等当前一步完成即可
+        if not self.writer.is_alive(): return
+        self.queue.put(_STOP)
+        self.writer.join(5)
+
+    def _write_loop(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            # 攒一批：到达时间或数量上限，或者有人在等待 (flush) 时立即提交
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE and batch[-1] is not _STOP and batch[-1][2] is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                running = False
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Database batch error: {e}", file=sys.stderr)
+                if self.conn.in_transaction: self.conn.rollback()
+            finally:
+                for _, _, done in batch:
+                    if done is not None and not done.done(): done.set_result(None)
+
+    def _write_batch(self, batch):
+        waiters = []
         cursor = self.conn.cursor()
-        start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO sessions (task_name, start_time, duration_minutes, status, distraction_count) VALUES (?, ?, ?, 'RUNNING', 0)", (task_name, start_time, duration))
-        self.conn.commit()
-        return cursor.lastrowid
+        if not self.conn.in_transaction: cursor.execute("BEGIN")
+        for op, args, done in batch:
+            if done is not None:
+                waiters.append(done)
+                continue
+            # 每个操作 (原始记录 + 汇总更新) 用保存点包起来，出错只回滚这一条，不影响同批其他写入
+            cursor.execute("SAVEPOINT op")
+            try:
+                op(cursor, *args)
+            except Exception as e:  # 任何异常都只影响这一条，写线程不能因此退出
+                print(f"Database write error: {e}", file=sys.stderr)
+                cursor.execute("ROLLBACK TO op")
+            cursor.execute("RELEASE op")
+        try:
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database commit error: {e}", file=sys.stderr)
+        for done in waiters:
+            done.set_result(None)
+
+    # ---------- 写操作 (接口与之前一致，均不阻塞) ----------
+    # 时间在调用时取得；_write_* 在写线程中执行，原始记录和汇总更新在同一事务中提交
+
+    def start_session(self, task_name, duration):
+        now = int(time.time())
+        with self.id_lock:
+            session_id = self.next_session_id
+            self.next_session_id += 1
+        self._submit(self._write_session_start, session_id, task_name, duration, now)
+        return session_id
 
     def end_session(self, session_id, status="COMPLETED"):
-        cursor = self.conn.cursor()
-        end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("UPDATE sessions SET end_time = ?, status = ? WHERE id = ?", (end_time, status, session_id))
-        self.conn.commit()
+        self._submit(self._write_session_end, session_id, status, int(time.time()))
+
+    def log_spans(self, spans):
+        """批量追加时间线片段 (core.timeline.Span)，由 TimelineRecorder 的后台线程调用"""
+        self._submit(self._write_spans, list(spans))
+
+    def log_episode(self, session_id, app_name, title, reason, start_ts, end_ts):
+        """记录一个分心片段 (一次连续停留在分心窗口上)"""
+        self._submit(self._write_episode, session_id, app_name, title, reason, int(start_ts), int(end_ts))
 
     def log_distraction(self, session_id, app_name, reason):
-        cursor = self.conn.cursor()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("INSERT INTO distractions (session_id, timestamp, app_name, reason) VALUES (?, ?, ?, ?)", (session_id, timestamp, app_name, reason))
-        cursor.execute("UPDATE sessions SET distraction_count = distraction_count + 1 WHERE id = ?", (session_id,))
-        self.conn.commit()
+        """旧接口：记录一个瞬时分心 (时长为 0 的片段)"""
+        now = int(time.time())
+        self.log_episode(session_id, app_name, "", reason, now, now)
+
+    def log_idle(self, session_id, start_ts, end_ts):
+        """记录一段离开 (无键鼠输入) 时段"""
+        self._submit(self._write_idle, session_id, int(start_ts), int(end_ts))
+
+    @staticmethod
+    def _write_session_start(cursor, session_id, task_name, duration, now):
+        cursor.execute("INSERT INTO sessions (id, task_name, start_time, start_ts, duration_minutes, status, distraction_count) VALUES (?, ?, ?, ?, ?, 'RUNNING', 0)",
+                       (session_id, task_name, _fmt(now), now, duration))
+        rollups.on_session_start(cursor, task_name, now, duration)
+
+    @staticmethod
+    def _write_session_end(cursor, session_id, status, now):
+        row = cursor.execute("SELECT task_name, start_ts, end_ts FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        cursor.execute("UPDATE sessions SET end_time = ?, end_ts = ?, status = ? WHERE id = ?", (_fmt(now), now, status, session_id))
+        if row and row[1] is not None and row[2] is None:  # 重复结束同一会话时不重复计入汇总
+            rollups.on_session_end(cursor, row[0], row[1], now, status)
+
+    @staticmethod
+    def _write_spans(cursor, spans):
+        cursor.executemany("INSERT INTO activity_timeline (process, title, distracted, start_ts, end_ts, duration) VALUES (?, ?, ?, ?, ?, ?)",
+                           [(s.process, s.title, None if s.distracted is None else int(s.distracted), s.start_ts, s.end_ts, s.end_ts - s.start_ts) for s in spans])
+
+    @staticmethod
+    def _write_episode(cursor, session_id, app_name, title, reason, start_ts, end_ts):
+        duration = end_ts - start_ts
+        cursor.execute("INSERT INTO distraction_episodes (session_id, app_name, title, reason, start_ts, end_ts, duration) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (session_id, app_name, title, reason, start_ts, end_ts, duration))
+        cursor.execute("UPDATE sessions SET distraction_count = distraction_count + 1, distraction_seconds = distraction_seconds + ? WHERE id = ?", (duration, session_id))
+        row = cursor.execute("SELECT task_name FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        rollups.on_distraction(cursor, row[0] if row else None, start_ts, end_ts, app_name)
+
+    @staticmethod
+    def _write_idle(cursor, session_id, start_ts, end_ts):
+        cursor.execute("INSERT INTO idle_periods (session_id, start_time, end_time, start_ts, end_ts, seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                       (session_id, _fmt(start_ts), _fmt(end_ts), start_ts, end_ts, end_ts - start_ts))
+        rollups.on_idle(cursor, start_ts, end_ts)
+
+    def rebuild_rollups(self):
+        """从原始记录重建汇总表，返回处理的记录数"""
+        result = Future()
+
+        def op(cursor):
+            try:
+                # 已归档月份的原始记录不在库中，其汇总保留不动
+                result.set_result(rollups.rebuild(cursor, _get_meta(cursor, "archived_before")))
+            except Exception as e:
+                result.set_exception(e)
+                raise
+        self._submit(op)
+        self.flush(timeout=None)
+        if not result.done(): raise RuntimeError("database writer is not running")
+        return result.result()
+
+    # ---------- 读操作 ----------
+
+    def _read_conn(self):
+        """每个线程一个只读连接"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
 
     def get_today_stats(self):
-        today = datetime.now().strftime("%Y-%m-%d")
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT task_name, duration_minutes, status, distraction_count FROM sessions WHERE start_time LIKE ?", (f'{today}%',))
+        self.flush()  # 先让尚未提交的写入可见
+        start, end = day_range()
+        cursor = self._read_conn().cursor()
+        # 按 epoch 索引做范围扫描，耗时只与当天的记录数有关
+        cursor.execute("SELECT task_name, duration_minutes, status, distraction_count FROM sessions WHERE start_ts >= ? AND start_ts < ? ORDER BY start_ts", (start, end))
         tasks = cursor.fetchall()
-        cursor.execute("SELECT reason, count(*) as cnt FROM distractions WHERE timestamp LIKE ? GROUP BY reason ORDER BY cnt DESC LIMIT 3", (f'{today}%',))
+        cursor.execute("SELECT reason, count(*) as cnt FROM distraction_episodes WHERE start_ts >= ? AND start_ts < ? GROUP BY reason ORDER BY cnt DESC LIMIT 3", (start, end))
         distractions = cursor.fetchall()
-        return tasks, distractions
\ No newline at end of file
+        return tasks, distractions
+
+    # ---------- 汇总查询 (读汇总表，不扫描原始记录) ----------
+
+    def get_daily_rollup(self, start_day, end_day):
+        """[start_day, end_day] 每天的汇总，日期为 date 对象"""
+        self.flush()
+        cursor = self._read_conn().cursor()
+        cursor.execute("SELECT day, sessions, completed, abandoned, planned_minutes, focus_seconds, distractions, idle_seconds, distraction_seconds FROM rollup_daily WHERE day >= ? AND day <= ? ORDER BY day",
+                       (start_day.isoformat(), end_day.isoformat()))
+        return cursor.fetchall()
+
+    def get_hourly_rollup(self, start_ts, end_ts):
+        """[start_ts, end_ts) 内每小时的汇总"""
+        self.flush()
+        cursor = self._read_conn().cursor()
+        cursor.execute("SELECT hour_ts, sessions, focus_seconds, distractions, idle_seconds, distraction_seconds FROM rollup_hourly WHERE hour_ts >= ? AND hour_ts < ? ORDER BY hour_ts", (start_ts, end_ts))
+        return cursor.fetchall()
+
+    def get_app_rollup(self, start_day, end_day, limit=10):
+        """一段时间内分心次数最多的应用"""
+        self.flush()
+        cursor = self._read_conn().cursor()
+        cursor.execute("SELECT app_name, SUM(distractions) AS cnt, SUM(distraction_seconds) FROM rollup_app WHERE day >= ? AND day <= ? GROUP BY app_name ORDER BY cnt DESC LIMIT ?",
+                       (start_day.isoformat(), end_day.isoformat(), limit))
+        return cursor.fetchall()
+
+    def get_task_rollup(self, start_day, end_day):
+        """一段时间内按任务汇总：(任务, 次数, 完成, 放弃, 专注秒数, 分心次数, 分心秒数)"""
+        self.flush()
+        cursor = self._read_conn().cursor()
+        cursor.execute("SELECT task_name, SUM(sessions), SUM(completed), SUM(abandoned), SUM(focus_seconds), SUM(distractions), SUM(distraction_seconds) FROM rollup_task WHERE day >= ? AND day <= ? GROUP BY task_name ORDER BY SUM(focus_seconds) DESC",
+                       (start_day.isoformat(), end_day.isoformat()))
+        return cursor.fetchall()
+
+    def get_range_summary(self, days=7):
+        """最近 days 天 (含今天) 的合计：(会话数, 完成数, 专注秒数, 分心次数, 分心秒数)"""
+        end_day = datetime.now().date()
+        rows = self.get_daily_rollup(end_day - timedelta(days=days - 1), end_day)
+        return (sum(r[1] for r in rows), sum(r[2] for r in rows), sum(r[5] for r in rows), sum(r[6] for r in rows), sum(r[8] for r in rows))
+
+    # ---------- 导出 ----------
+
+    def export(self, dataset, fmt, out, start_day=None, end_day=None):
+        """
+        流式导出 sessions / distractions / idle / timeline (见 core/export.py)，返回行数。
+        start_day / end_day 为 date 对象 (含首尾两天)，过滤条件下推到 SQL。
+        """
+        self.flush()
+        start_ts = day_range(start_day)[0] if start_day else None
+        end_ts = day_range(end_day)[1] if end_day else None
+        # 独立连接，导出大表时不占用本线程的读连接
+        conn = self._connect()
+        try:
+            return export.export(conn, dataset, fmt, out, start_ts, end_ts)
+        finally:
+            conn.close()
+
+    def query_archive(self, dataset, start_day=None, end_day=None):
+        """
+        按需读取已归档 (超过保留期、已移出数据库) 的原始记录，逐行产出 dict。
+        start_day / end_day 为 date 对象 (含首尾两天)，只解压范围内的月份文件。
+        """
+        start_ts = day_range(start_day)[0] if start_day else None
+        end_ts = day_range(end_day)[1] if end_day else None
+        return archive.read_archive(CONFIG.get("archive_dir"), dataset, start_ts, end_ts)
+
+    # ---------- 保留期与整理 ----------
+
+    def maintain(self, force=False):
+        """
+        在后台线程中执行维护 (用户离开座位时调用)，不阻塞调用方；已在运行时直接返回。
+        距上次维护不足 MAINTENANCE_INTERVAL 时跳过，force=True 时总是执行。
+        返回新启动的维护线程，已有维护在运行时返回 None。
+        """
+        if self.maintainer and self.maintainer.is_alive(): return None
+        self.maintainer = threading.Thread(target=self._maintain, args=(force,), daemon=True)
+        self.maintainer.start()
+        return self.maintainer
+
+    def _file_size(self):
+        """数据库文件加 WAL 文件的总字节数"""
+        return sum(os.path.getsize(p) for p in (self.db_name, self.db_name + "-wal") if os.path.exists(p))
+
+    def _maintain(self, force):
+        """
+        1. 超过 retention_days 的原始记录 (汇总表中已有) 按月归档到 archive_dir 并从库中删除
+        2. 增量 vacuum 归还空闲页；旧库 (非增量模式) 只在 force 时用一次完整 VACUUM 转换
+        3. PRAGMA optimize 更新查询规划统计，截断 WAL 文件
+        使用独立连接，写线程照常工作，只在每步提交时短暂等锁。
+        """
+        conn = self._connect()
+        try:
+            now = time.time()
+            last = _get_meta(conn, "last_maintenance", 0)
+            if not force and now - last < MAINTENANCE_INTERVAL: return
+            t = time.perf_counter()
+            counts = {}
+            days = CONFIG.get("retention_days")
+            if days and days > 0:
+                cutoff = day_range(datetime.now().date() - timedelta(days=days))[0]
+                counts = archive.archive_before(conn, cutoff, CONFIG.get("archive_dir"))
+                _set_meta(conn, "archived_before", max(cutoff, _get_meta(conn, "archived_before", 0)))
+            _set_meta(conn, "last_maintenance", int(now))
+            conn.commit()
+
+            before = self._file_size()
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                conn.execute("PRAGMA incremental_vacuum").fetchall()  # 需要逐步执行到结束才会释放全部空闲页
+            elif force:
+                # 完整 VACUUM 期间整个库被锁住，RuleStore 等旁路连接会报 "database is locked"，
+                # 所以只在命令行 (dbtool archive，应用未运行) 中执行这一次转换
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            archived = ", ".join(f"{n} {name}" for name, n in counts.items()) or "nothing"
+            print(f"Database maintenance: archived {archived}, {before // 1024} KB -> {self._file_size() // 1024} KB in {time.perf_counter() - t:.2f}s", file=sys.stderr)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Database maintenance error: {e}", file=sys.stderr)
+        finally:
+            conn.close()
@@ -0,0 +1,56 @@
+import time
+from core.config import CONFIG
+
+MAX_STEP = 5      # 两次采样间隔超过该值 (秒) 时只计入这么多，避免休眠/卡顿被算作停留
+PRUNE_BELOW = 1.0  # 衰减到 1 秒以下的记录直接清理
+
+
+class DwellTracker:
+    """
+    前台停留时间累加器。
+    当前窗口每次采样累加停留秒数；离开后按半衰期指数衰减，
+    这样"刷一下就走"不会累计，但反复回到同一个应用会逐渐逼近提醒阈值。
+    """
+    def __init__(self, half_life=None):
+        self.half_life = half_life or CONFIG.get("dwell_half_life")
+        self.entries = {}  # key -> [累计秒数, 上次更新时间]
+        self.current = None
+        self.last_ts = None
+
+    @staticmethod
+    def make_key(proc, canon_title):
+        # dwell_scope = "app" 时按应用累计，否则按应用 + 归一化标题累计
+        if CONFIG.get("dwell_scope") == "app": return (proc or "").lower()
+        return f"{(proc or '').lower()}|{canon_title}"
+
+    def observe(self, key, now=None):
+        """记录一次采样，返回该窗口当前的累计停留秒数"""
+        now = now if now is not None else time.time()
+        if self.current is not None and self.last_ts is not None:
+            entry = self.entries.get(self.current)
+            if entry:
+                entry[0] += min(max(now - self.last_ts, 0), MAX_STEP)
+                entry[1] = now
+
+        if key != self.current and len(self.entries) > 64:
+            self._prune(now)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [0.0, now]
+        elif key != self.current:
+            # 离开期间的衰减
+            entry[0] *= 0.5 ** ((now - entry[1]) / self.half_life)
+            entry[1] = now
+        self.current, self.last_ts = key, now
+        return entry[0]
+
+    def reset(self):
+        """暂停/切换步骤后重新开始计时，避免把暂停期间算作停留"""
+        self.current = None
+        self.last_ts = None
+
+    def _prune(self, now):
+        for k in [k for k, (acc, ts) in self.entries.items()
+                  if k != self.current and acc * 0.5 ** ((now - ts) / self.half_life) < PRUNE_BELOW]:
+            del self.entries[k]
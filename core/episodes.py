@@ -0,0 +1,45 @@
+import threading
+from collections import namedtuple
+
+Episode = namedtuple("Episode", "process title reason start_ts end_ts")
+
+
+class EpisodeTracker:
+    """
+    把监督流合并为分心片段：一次连续停留在分心窗口上记为一条 (开始, 结束)，而不是每次采样一行。
+    - mark(): 判定结果返回时调用，分心则打开片段 (开始时间取该窗口切到前台的时刻)
+    - leave(): 每次采样调用，前台离开片段所在窗口时结束片段
+    - close(): 暂停/离开/切换步骤时强制结束
+    结束的片段作为返回值交给调用方写库。判定回调和采样在不同线程，内部加锁。
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = None  # (key, process, title, reason, start_ts)
+
+    def mark(self, key, process, title, reason, is_distracted, since, now):
+        """记录一次判定结果，返回因此结束的片段 (没有则为 None)"""
+        with self.lock:
+            if self.open and self.open[0] == key:
+                # 同一窗口再次判定为分心：片段继续；判定为专注 (如用户刚放行)：片段结束
+                return None if is_distracted else self._close(now)
+            closed = self._close(now)
+            if is_distracted:
+                self.open = (key, process, title, reason, min(since, now))
+            return closed
+
+    def leave(self, key, now):
+        """前台窗口为 key；若已离开片段所在窗口则结束片段"""
+        with self.lock:
+            if self.open and self.open[0] != key:
+                return self._close(now)
+            return None
+
+    def close(self, now):
+        with self.lock:
+            return self._close(now)
+
+    def _close(self, now):
+        if not self.open: return None
+        _, process, title, reason, start = self.open
+        self.open = None
+        return Episode(process, title, reason, start, max(now, start))
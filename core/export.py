@@ -0,0 +1,111 @@
+import csv
+import json
+import sys
+
+BATCH_SIZE = 1000  # 每次 fetchmany 的行数，导出时内存占用与总行数无关
+
+# 可导出的数据集：表名, 时间过滤/排序列 (均有索引), [(列名, 类型)]
+DATASETS = {
+    "sessions": ("sessions", "start_ts", [
+        ("id", "int"), ("task_name", "str"), ("start_ts", "int"), ("end_ts", "int"), ("duration_minutes", "int"),
+        ("status", "str"), ("distraction_count", "int"), ("distraction_seconds", "int")]),
+    "distractions": ("distraction_episodes", "start_ts", [
+        ("id", "int"), ("session_id", "int"), ("app_name", "str"), ("title", "str"), ("reason", "str"),
+        ("start_ts", "int"), ("end_ts", "int"), ("duration", "int")]),
+    "idle": ("idle_periods", "start_ts", [
+        ("id", "int"), ("session_id", "int"), ("start_ts", "int"), ("end_ts", "int"), ("seconds", "int")]),
+    "timeline": ("activity_timeline", "start_ts", [
+        ("id", "int"), ("process", "str"), ("title", "str"), ("distracted", "int"),
+        ("start_ts", "float"), ("end_ts", "float"), ("duration", "float")]),
+}
+FORMATS = ("jsonl", "csv", "parquet")
+
+
+def columns(dataset):
+    return [name for name, _ in DATASETS[dataset][2]]
+
+
+def iter_batches(conn, dataset, start_ts=None, end_ts=None, batch_size=BATCH_SIZE):
+    """
+    按时间顺序逐批产出 [(行), ...]。
+    时间范围 [start_ts, end_ts) 下推到 SQL，走 start_ts 索引做范围扫描。
+    """
+    if dataset not in DATASETS: raise ValueError(f"unknown dataset: {dataset}")
+    table, ts_col, cols = DATASETS[dataset]
+    where, params = [], []
+    if start_ts is not None:
+        where.append(f"{ts_col} >= ?"); params.append(start_ts)
+    if end_ts is not None:
+        where.append(f"{ts_col} < ?"); params.append(end_ts)
+    sql = f"SELECT {', '.join(name for name, _ in cols)} FROM {table}"
+    if where: sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {ts_col}, id"
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    try:
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            yield rows
+    finally:
+        cursor.close()
+
+
+def write_jsonl(batches, cols, out):
+    n = 0
+    for rows in batches:
+        for row in rows:
+            out.write(json.dumps(dict(zip(cols, row)), ensure_ascii=False) + "\n")
+        n += len(rows)
+    return n
+
+
+def write_csv(batches, cols, out):
+    writer = csv.writer(out)
+    writer.writerow(cols)
+    n = 0
+    for rows in batches:
+        writer.writerows(rows)
+        n += len(rows)
+    return n
+
+
+_ARROW_TYPES = {"int": "int64", "str": "string", "float": "float64"}
+
+
+def write_parquet(batches, dataset, path):
+    """每批写成一个 row group，无需把整张表读进内存"""
+    # pyarrow 体积很大，只在导出 Parquet 时才导入
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow. Install with: pip install pyarrow")
+    spec = DATASETS[dataset][2]
+    schema = pa.schema([(name, pa.type_for_alias(_ARROW_TYPES[kind])) for name, kind in spec])
+    n = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            arrays = [pa.array([r[i] for r in rows], type=schema.field(i).type) for i in range(len(spec))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            n += len(rows)
+    return n
+
+
+def export(conn, dataset, fmt, out, start_ts=None, end_ts=None):
+    """
+    导出一个数据集，返回行数。
+    out 为文件路径或 "-" (标准输出，仅 jsonl/csv)；jsonl/csv 也可以直接传入已打开的文本文件对象。
+    """
+    if fmt not in FORMATS: raise ValueError(f"unknown format: {fmt}")
+    batches = iter_batches(conn, dataset, start_ts, end_ts)
+    if fmt == "parquet":
+        if not isinstance(out, str) or out == "-":
+            raise ValueError("parquet export needs an output file path")
+        return write_parquet(batches, dataset, out)
+
+    write = write_jsonl if fmt == "jsonl" else write_csv
+    if not isinstance(out, str):
+        return write(batches, columns(dataset), out)
+    if out == "-":
+        return write(batches, columns(dataset), sys.stdout)
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        return write(batches, columns(dataset), f)
@@ -0,0 +1,118 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from core.config import CONFIG
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("Warning: focus heatmaps require numpy. Install with: pip install numpy")
+
+DAY_SECONDS = 86400
+MAX_OPEN = 4  # 同时映射的天数 (一般只有今天，跨零点时还有昨天)
+
+# 每秒一个字节的状态
+NONE, FOCUS, DISTRACTED, IDLE, PAUSED = range(5)
+STATE_NAMES = ("none", "focus", "distracted", "idle", "paused")
+
+
+def _day_start(day):
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+
+class FocusMap:
+    """
+    按天存储的每秒状态图：focusmap/YYYY-MM-DD.bin，固定 86400 字节，第 i 字节为当天第 i 秒的状态。
+    写入通过 mmap 直接改内存页 (不经过 flowmate.db)；读取用 np.memmap 视图，
+    一年的热力图/专注率只需对 365 x 86400 的数组做向量化运算。
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or CONFIG.get("focusmap_dir")
+        self.lock = threading.Lock()
+        self.maps = OrderedDict()  # date -> mmap
+
+    def path(self, day):
+        return os.path.join(self.directory, f"{day.isoformat()}.bin")
+
+    def _open(self, day):
+        mm = self.maps.get(day)
+        if mm is not None:
+            self.maps.move_to_end(day)
+            return mm
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(day)
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            if os.fstat(f.fileno()).st_size != DAY_SECONDS:
+                f.truncate(DAY_SECONDS)  # 新文件 (或损坏的文件) 补齐为全 NONE
+            mm = mmap.mmap(f.fileno(), DAY_SECONDS)
+        self.maps[day] = mm
+        while len(self.maps) > MAX_OPEN:
+            self.maps.popitem(last=False)[1].close()
+        return mm
+
+    # ---------- 写入 (监督线程) ----------
+
+    def fill(self, start_ts, end_ts, state):
+        """把 [start_ts, end_ts) 内的每一秒标记为 state，可跨天"""
+        with self.lock:
+            t = start_ts
+            while t < end_ts:
+                day = datetime.fromtimestamp(t).date()
+                base = _day_start(day)
+                day_end = _day_start(day + timedelta(days=1))
+                a = min(max(int(t - base), 0), DAY_SECONDS)
+                b = min(max(int(min(end_ts, day_end) - base), 0), DAY_SECONDS)
+                if b > a:
+                    try:
+                        self._open(day)[a:b] = bytes((state,)) * (b - a)
+                    except (OSError, ValueError) as e:
+                        print(f"Focus map write error: {e}")
+                        return
+                t = day_end
+
+    def close(self):
+        with self.lock:
+            for mm in self.maps.values():
+                mm.flush()
+                mm.close()
+            self.maps.clear()
+
+    # ---------- 读取 (需要 numpy) ----------
+
+    def day_array(self, day):
+        """某一天的只读状态数组 (长度 86400)，没有记录的日期返回全 NONE"""
+        path = self.path(day)
+        if os.path.exists(path) and os.path.getsize(path) == DAY_SECONDS:
+            return np.memmap(path, dtype=np.uint8, mode="r", shape=(DAY_SECONDS,))
+        return np.zeros(DAY_SECONDS, dtype=np.uint8)
+
+    def load_range(self, start_day, end_day):
+        """[start_day, end_day] 的状态矩阵，形状为 (天数, 86400)"""
+        if not NUMPY_AVAILABLE: return None
+        days = (end_day - start_day).days + 1
+        if days <= 0: return np.zeros((0, DAY_SECONDS), dtype=np.uint8)
+        return np.stack([self.day_array(start_day + timedelta(days=i)) for i in range(days)])
+
+    def heatmap(self, start_day, end_day, state=FOCUS, bucket=3600):
+        """每天每个时段 (默认每小时) 处于 state 的秒数，形状为 (天数, 86400 // bucket)"""
+        arr = self.load_range(start_day, end_day)
+        if arr is None: return None
+        return np.count_nonzero((arr == state).reshape(arr.shape[0], DAY_SECONDS // bucket, bucket), axis=2)
+
+    def totals(self, start_day, end_day):
+        """各状态的总秒数：{"focus": ..., "distracted": ..., ...}"""
+        arr = self.load_range(start_day, end_day)
+        if arr is None: return None
+        # 按状态逐个 count_nonzero，比 uint8 上的 bincount (需转换为 intp) 快得多
+        return {name: int(np.count_nonzero(arr == i)) for i, name in enumerate(STATE_NAMES)}
+
+    def focus_ratio(self, start_day, end_day):
+        """专注秒数 / (专注 + 分心)，没有记录时返回 None"""
+        t = self.totals(start_day, end_day)
+        if not t: return None
+        active = t["focus"] + t["distracted"]
+        return t["focus"] / active if active else None
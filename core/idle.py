@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+
+# Platform-specific imports
+if sys.platform == 'darwin':  # macOS
+    try:
+        from Quartz import (
+            CGEventSourceSecondsSinceLastEventType,
+            kCGEventSourceStateCombinedSessionState,
+            kCGAnyInputEventType
+        )
+        IDLE_SUPPORTED = True
+    except ImportError:
+        IDLE_SUPPORTED = False
+        print("Warning: macOS idle detection requires pyobjc. Install with: pip install pyobjc-framework-Quartz")
+elif sys.platform == 'win32':  # Windows
+    import ctypes
+    from ctypes import wintypes
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+
+    IDLE_SUPPORTED = True
+elif sys.platform.startswith('linux') and os.environ.get("DISPLAY"):  # Linux X11
+    try:
+        from Xlib import display as xdisplay
+        IDLE_SUPPORTED = True
+    except ImportError:
+        IDLE_SUPPORTED = False
+        print("Warning: X11 idle detection requires python-xlib. Install with: pip install python-xlib")
+else:
+    IDLE_SUPPORTED = False
+
+
+class IdleDetector:
+    """
+    用户输入空闲检测接口。
+    - idle_seconds(): 距离最后一次键盘/鼠标输入的秒数
+    查询都是一次系统调用，监督线程空闲期间可以每秒调用，输入恢复后立即感知。
+    """
+    supported = True
+
+    def idle_seconds(self):
+        raise NotImplementedError
+
+
+class UnsupportedIdleDetector(IdleDetector):
+    """无法检测时始终视为有输入，监督行为与之前一致"""
+    supported = False
+
+    def idle_seconds(self):
+        return 0.0
+
+
+class MacIdleDetector(IdleDetector):
+    """macOS 实现 (Quartz 事件源)"""
+    def idle_seconds(self):
+        return CGEventSourceSecondsSinceLastEventType(kCGEventSourceStateCombinedSessionState, kCGAnyInputEventType)
+
+
+class Win32IdleDetector(IdleDetector):
+    """Windows 实现 (GetLastInputInfo)"""
+    def idle_seconds(self):
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+            return 0.0
+        # 两者都是 32 位毫秒计数，按无符号差值处理回绕
+        return ((ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF) / 1000.0
+
+
+class X11IdleDetector(IdleDetector):
+    """Linux X11 实现 (MIT-SCREEN-SAVER 扩展)"""
+    def __init__(self):
+        self.display = None
+        self.root = None
+        self.supported = True
+
+    def idle_seconds(self):
+        if not self.supported: return 0.0
+        try:
+            if self.display is None:
+                self.display = xdisplay.Display()
+                if not self.display.has_extension("MIT-SCREEN-SAVER"):
+                    print("Warning: X server lacks MIT-SCREEN-SAVER, idle detection disabled")
+                    self.supported = False
+                    return 0.0
+                self.root = self.display.screen().root
+            return self.root.screensaver_query_info().idle / 1000.0
+        except Exception as e:
+            print(f"Idle query error: {e}")
+            self.display = None  # 下次重新连接
+            return 0.0
+
+
+class FakeIdleDetector(IdleDetector):
+    """
+    假空闲来源，用于测试：
+    touch() 模拟一次输入，set_idle(120) 模拟已经 120 秒没有输入。
+    """
+    def __init__(self):
+        self.last_input = time.time()
+
+    def touch(self):
+        self.last_input = time.time()
+
+    def set_idle(self, seconds):
+        self.last_input = time.time() - seconds
+
+    def idle_seconds(self):
+        return max(time.time() - self.last_input, 0.0)
+
+
+def create_idle_detector():
+    """按平台选择空闲检测实现"""
+    if not IDLE_SUPPORTED:
+        return UnsupportedIdleDetector()
+    if sys.platform == 'darwin':
+        return MacIdleDetector()
+    if sys.platform == 'win32':
+        return Win32IdleDetector()
+    return X11IdleDetector()
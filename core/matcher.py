@@ -0,0 +1,74 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 多模式匹配器 (大小写不敏感)。
+    构建一次后，search 只需扫描一遍文本，耗时与关键词数量无关。
+    """
+    def __init__(self, terms):
+        self.goto = [{}]     # 节点 -> {字符: 子节点}
+        self.fail = [0]      # 失配指针
+        self.out = [None]    # 在该节点结束的关键词 (原始写法)
+        for term in terms:
+            self._insert(term)
+        self._build()
+
+    def _insert(self, term):
+        key = str(term).strip().lower()
+        if not key: return
+        node = 0
+        for ch in key:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({}); self.fail.append(0); self.out.append(None)
+            node = nxt
+        if self.out[node] is None:
+            self.out[node] = str(term).strip()
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                # 继承失配节点的输出，保证后缀关键词也能被命中
+                if self.out[child] is None:
+                    self.out[child] = self.out[self.fail[child]]
+                queue.append(child)
+
+    def __bool__(self):
+        return len(self.goto) > 1
+
+    def search(self, text):
+        """返回文本中最先出现的关键词，没有则返回 None"""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] is not None:
+                return out[node]
+        return None
+
+    def search_all(self, text):
+        """返回文本中出现的所有关键词 (去重，按出现顺序)"""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = []
+        node = 0
+        for ch in text.lower():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            # 沿失配链收集所有在此处结束的关键词
+            n = node
+            while n and out[n] is not None:
+                if out[n] not in found: found.append(out[n])
+                n = self.fail[n]
+        return found
@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict, namedtuple
+import psutil
+
+ProcInfo = namedtuple("ProcInfo", "name exe create_time")
+
+
+class ProcessCache:
+    """
+    pid -> (进程名, 可执行文件路径, 创建时间) 缓存。
+    前台 pid 很少变化，命中时只做一次 is_running() 校验 (比对创建时间，防止 pid 被复用)，
+    不再每秒读取进程名和路径。
+    """
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # pid -> (psutil.Process, ProcInfo)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, pid):
+        """返回 ProcInfo，进程不存在或无权限时返回 None"""
+        if not pid: return None
+        with self.lock:
+            entry = self.entries.get(pid)
+        if entry:
+            proc, info = entry
+            try:
+                if proc.is_running():
+                    with self.lock:
+                        self.entries.move_to_end(pid)
+                        self.hits += 1
+                    return info
+            except psutil.Error:
+                pass
+
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                name = proc.name()
+                create_time = proc.create_time()
+                try:
+                    exe = proc.exe()
+                except psutil.Error:
+                    exe = ""  # 系统进程可能没有权限读取路径
+        except psutil.Error:
+            return None
+        info = ProcInfo(name, exe, create_time)
+        with self.lock:
+            self.misses += 1
+            self.entries[pid] = (proc, info)
+            self.entries.move_to_end(pid)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return info
+
+
+# Singleton instance
+PROCESS_CACHE = ProcessCache()
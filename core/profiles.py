@@ -0,0 +1,89 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from core.config import CONFIG
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[一-鿿]+")
+
+
+def _norm(s):
+    return " ".join((s or "").lower().split())
+
+
+def tokenize(s):
+    """英文按单词切分，中文按相邻两字切分 (bigram)，"写周报"/"写本周周报" 也能算出相似度"""
+    s = _norm(s)
+    tokens = set(_WORD_RE.findall(s))
+    for run in _CJK_RE.findall(s):
+        if len(run) == 1:
+            tokens.add(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return frozenset(tokens)
+
+
+def jaccard(a, b):
+    if not a or not b: return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ProfileStore:
+    """
+    已生成画像的持久化存储 (flowmate.db 的 task_profiles 表)，按归一化后的 (main_goal, sub_goal) 索引。
+    精确命中直接复用；否则在内存中做 token Jaccard 相似度查找，超过阈值即复用最接近的画像。
+    """
+    def __init__(self, db_name="flowmate.db"):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.conn = None
+        self.entries = None  # {(main_norm, sub_norm): (main_tokens, sub_tokens, profile)}
+
+    def _load(self):
+        if self.entries is not None: return
+        self.entries = {}
+        try:
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS task_profiles (main_goal TEXT, sub_goal TEXT, profile TEXT, updated_at REAL, PRIMARY KEY (main_goal, sub_goal))''')
+            self.conn.commit()
+            for main, sub, profile in self.conn.execute("SELECT main_goal, sub_goal, profile FROM task_profiles"):
+                self.entries[(main, sub)] = (tokenize(main), tokenize(sub), json.loads(profile))
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Profile store load error: {e}")
+
+    def lookup(self, main_goal, sub_goal):
+        """返回 (profile, exact)；没有足够相似的记录时返回 None"""
+        key = (_norm(main_goal), _norm(sub_goal))
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry: return entry[2], True
+
+            main_tokens, sub_tokens = tokenize(main_goal), tokenize(sub_goal)
+            best, best_score = None, 0.0
+            for m_tok, s_tok, profile in self.entries.values():
+                # 子任务决定画像的主体，总目标只做辅助
+                score = 0.7 * jaccard(sub_tokens, s_tok) + 0.3 * jaccard(main_tokens, m_tok)
+                if score > best_score:
+                    best, best_score = profile, score
+            if best is not None and best_score >= CONFIG.get("profile_similarity"):
+                return best, False
+            return None
+
+    def save(self, main_goal, sub_goal, profile):
+        key = (_norm(main_goal), _norm(sub_goal))
+        with self.lock:
+            self._load()
+            self.entries[key] = (tokenize(key[0]), tokenize(key[1]), profile)
+            if self.conn is None: return
+            try:
+                self.conn.execute("INSERT OR REPLACE INTO task_profiles (main_goal, sub_goal, profile, updated_at) VALUES (?, ?, ?, ?)",
+                                  (key[0], key[1], json.dumps(profile, ensure_ascii=False), time.time()))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Profile store write error: {e}")
+
+
+# Singleton instance
+PROFILE_STORE = ProfileStore()
@@ -0,0 +1,120 @@
+"""
+按天 / 小时 / 应用 / 任务的汇总表，随写入增量维护 (与原始记录在同一事务中提交)。
+周报、月报、趋势只需读取几百行汇总，不必扫描全部历史。
+
+- 天以本地日期 "YYYY-MM-DD" 为键；一个会话的专注时长计入其开始的那一天
+- 小时以本地整点的 epoch 秒为键；专注时长和分心时长按小时拆分
+- 分心次数按分心片段 (distraction_episodes) 计
+"""
+from datetime import datetime
+
+STATUS_COLUMNS = {"COMPLETED": "completed", "ABANDONED": "abandoned"}
+
+
+def create_tables(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_daily (day TEXT PRIMARY KEY, sessions INTEGER DEFAULT 0, completed INTEGER DEFAULT 0, abandoned INTEGER DEFAULT 0, planned_minutes INTEGER DEFAULT 0, focus_seconds INTEGER DEFAULT 0, distractions INTEGER DEFAULT 0, idle_seconds INTEGER DEFAULT 0)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_hourly (hour_ts INTEGER PRIMARY KEY, sessions INTEGER DEFAULT 0, focus_seconds INTEGER DEFAULT 0, distractions INTEGER DEFAULT 0, idle_seconds INTEGER DEFAULT 0)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_app (day TEXT, app_name TEXT, distractions INTEGER DEFAULT 0, PRIMARY KEY (day, app_name))''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS rollup_task (day TEXT, task_name TEXT, sessions INTEGER DEFAULT 0, completed INTEGER DEFAULT 0, abandoned INTEGER DEFAULT 0, planned_minutes INTEGER DEFAULT 0, focus_seconds INTEGER DEFAULT 0, distractions INTEGER DEFAULT 0, PRIMARY KEY (day, task_name))''')
+
+
+def day_key(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def hour_key(ts):
+    return int(datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0).timestamp())
+
+
+def split_hours(start_ts, end_ts):
+    """把 [start_ts, end_ts) 拆成 (整点, 秒数) 列表"""
+    parts = []
+    t = start_ts
+    while t < end_ts:
+        hour = hour_key(t)
+        nxt = min(hour + 3600, end_ts)
+        parts.append((hour, nxt - t))
+        t = nxt
+    return parts
+
+
+def _add(cursor, table, keys, values):
+    """UPSERT 累加：keys/values 为 {列名: 值}"""
+    cols = list(keys) + list(values)
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in values)
+    cursor.execute(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+                   f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}",
+                   [*keys.values(), *values.values()])
+
+
+def on_session_start(cursor, task_name, start_ts, duration):
+    day = day_key(start_ts)
+    _add(cursor, "rollup_daily", {"day": day}, {"sessions": 1, "planned_minutes": duration or 0})
+    _add(cursor, "rollup_hourly", {"hour_ts": hour_key(start_ts)}, {"sessions": 1})
+    _add(cursor, "rollup_task", {"day": day, "task_name": task_name}, {"sessions": 1, "planned_minutes": duration or 0})
+
+
+def on_session_end(cursor, task_name, start_ts, end_ts, status):
+    day = day_key(start_ts)
+    focus = max(end_ts - start_ts, 0)
+    counts = {"focus_seconds": focus}
+    if status in STATUS_COLUMNS: counts[STATUS_COLUMNS[status]] = 1
+    _add(cursor, "rollup_daily", {"day": day}, counts)
+    _add(cursor, "rollup_task", {"day": day, "task_name": task_name}, counts)
+    for hour, seconds in split_hours(start_ts, end_ts):
+        _add(cursor, "rollup_hourly", {"hour_ts": hour}, {"focus_seconds": seconds})
+
+
+def on_distraction(cursor, task_name, start_ts, end_ts, app_name):
+    """一个分心片段：次数计入开始的那一天/小时，时长按小时拆分"""
+    day = day_key(start_ts)
+    counts = {"distractions": 1, "distraction_seconds": max(end_ts - start_ts, 0)}
+    _add(cursor, "rollup_daily", {"day": day}, counts)
+    _add(cursor, "rollup_hourly", {"hour_ts": hour_key(start_ts)}, {"distractions": 1})
+    for hour, seconds in split_hours(start_ts, end_ts):
+        _add(cursor, "rollup_hourly", {"hour_ts": hour}, {"distraction_seconds": seconds})
+    _add(cursor, "rollup_app", {"day": day, "app_name": app_name or ""}, counts)
+    if task_name is not None:
+        _add(cursor, "rollup_task", {"day": day, "task_name": task_name}, counts)
+
+
+def on_idle(cursor, start_ts, end_ts):
+    _add(cursor, "rollup_daily", {"day": day_key(start_ts)}, {"idle_seconds": max(end_ts - start_ts, 0)})
+    for hour, seconds in split_hours(start_ts, end_ts):
+        _add(cursor, "rollup_hourly", {"hour_ts": hour}, {"idle_seconds": seconds})
+
+
+def rebuild(cursor, since_ts=0):
+    """
+    清空并从原始记录重建汇总 (用于旧数据库回填或校正)，返回处理的记录数。
+    since_ts 为已归档数据的分界 (本地零点)：之前的原始记录已移出数据库，其汇总保留不动。
+    """
+    since_ts = since_ts or 0
+    since_day = day_key(since_ts) if since_ts else ""
+    cursor.execute("DELETE FROM rollup_daily WHERE day >= ?", (since_day,))
+    cursor.execute("DELETE FROM rollup_app WHERE day >= ?", (since_day,))
+    cursor.execute("DELETE FROM rollup_task WHERE day >= ?", (since_day,))
+    cursor.execute("DELETE FROM rollup_hourly WHERE hour_ts >= ?", (since_ts,))
+    n = 0
+    # 用独立游标逐批读取原始记录，写入走传入的游标
+    read = cursor.connection.cursor()
+    read.execute("SELECT task_name, start_ts, end_ts, duration_minutes, status FROM sessions WHERE start_ts >= ?", (since_ts,))
+    for rows in iter(lambda: read.fetchmany(500), []):
+        for task_name, start_ts, end_ts, duration, status in rows:
+            on_session_start(cursor, task_name, start_ts, duration)
+            if end_ts is not None:
+                on_session_end(cursor, task_name, start_ts, end_ts, status)
+            n += 1
+    # 迁移 2 回填时片段表还不存在，旧的分心记录由迁移 3 转换为片段后再重建一次
+    if read.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'distraction_episodes'").fetchone():
+        read.execute("SELECT s.task_name, e.start_ts, e.end_ts, e.app_name FROM distraction_episodes e LEFT JOIN sessions s ON s.id = e.session_id WHERE e.start_ts >= ?", (since_ts,))
+        for rows in iter(lambda: read.fetchmany(500), []):
+            for task_name, start_ts, end_ts, app_name in rows:
+                on_distraction(cursor, task_name, start_ts, end_ts, app_name)
+                n += 1
+    read.execute("SELECT start_ts, end_ts FROM idle_periods WHERE start_ts >= ? AND end_ts IS NOT NULL", (since_ts,))
+    for rows in iter(lambda: read.fetchmany(500), []):
+        for start_ts, end_ts in rows:
+            on_idle(cursor, start_ts, end_ts)
+            n += 1
+    return n
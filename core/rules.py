@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+from core.matcher import KeywordMatcher
+
+Rule = namedtuple("Rule", "id kind pattern action scope scope_value")
+
+# 窗口来源只提供进程名和标题，拿不到真实 URL，所以不提供"域名"规则；
+# 网站请用标题片段 (如 "bilibili")
+KINDS = ("process", "title")
+ACTIONS = ("allow", "block")
+SCOPES = ("global", "goal", "step")  # 全局 / 当前总目标 / 当前步骤
+_SCOPE_RANK = {"step": 2, "goal": 1, "global": 0}
+
+# 归一化后的浏览器进程名 (Windows / macOS / Linux)，精确匹配，避免 "arc" 误中 "searchapp" 之类
+BROWSERS = frozenset({
+    "chrome", "google chrome", "google-chrome", "chromium", "chromium-browser",
+    "msedge", "microsoft edge", "microsoft-edge",
+    "firefox", "firefox-esr", "safari", "brave", "brave browser", "arc",
+    "opera", "vivaldi", "vivaldi-bin", "360se", "360chrome", "qqbrowser", "sogouexplorer",
+})
+
+
+def _norm(s):
+    return " ".join((s or "").lower().split())
+
+
+def norm_process(name):
+    """进程名统一为小写并去掉 .exe / .app 后缀；完整路径只统一大小写"""
+    name = _norm(name)
+    if "/" in name or "\\" in name: return name
+    for suffix in (".exe", ".app"):
+        if name.endswith(suffix): name = name[:-len(suffix)]
+    return name
+
+
+def is_browser(process):
+    # 进程名可能是完整路径，只取文件名比较
+    name = (process or "").replace("\\", "/").rsplit("/", 1)[-1]
+    return norm_process(name) in BROWSERS
+
+
+class RuleStore:
+    """
+    用户自定义的放行/屏蔽规则 (flowmate.db 的 user_rules 表)。
+    规则编译为内存索引：进程名用字典精确查找，标题片段用 Aho-Corasick 一次扫描。
+    judge 在画像匹配和 LLM 之前先查这里，纠正过的误判不会再产生 API 调用。
+    """
+    def __init__(self, db_name="flowmate.db"):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.conn = None
+        self.rules = None
+        self.by_process = {}
+        self.by_term = {}
+        self.term_matcher = None
+
+    def _get_conn(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS user_rules (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT, pattern TEXT, action TEXT, scope TEXT DEFAULT 'global', scope_value TEXT DEFAULT '', created_at TEXT)''')
+            self.conn.commit()
+        return self.conn
+
+    def _ensure_loaded(self):
+        if self.rules is not None: return
+        try:
+            rows = self._get_conn().execute("SELECT id, kind, pattern, action, scope, scope_value FROM user_rules ORDER BY id").fetchall()
+        except sqlite3.Error as e:
+            print(f"Rule store load error: {e}")
+            rows = []
+        self._compile([Rule(*r) for r in rows])
+
+    def _compile(self, rules):
+        by_process, by_term = {}, {}
+        for r in rules:
+            if r.kind == "process":
+                by_process.setdefault(norm_process(r.pattern), []).append(r)
+            else:  # 旧版本保存的 "domain" 规则按标题片段处理
+                by_term.setdefault(_norm(r.pattern), []).append(r)
+        self.rules = rules
+        self.by_process = by_process
+        self.by_term = by_term
+        self.term_matcher = KeywordMatcher(by_term.keys())
+
+    def list_rules(self):
+        with self.lock:
+            self._ensure_loaded()
+            return list(self.rules)
+
+    def add_rule(self, kind, pattern, action="allow", scope="global", scope_value=""):
+        if kind not in KINDS or action not in ACTIONS or scope not in SCOPES or not _norm(pattern):
+            raise ValueError(f"invalid rule: {kind} {pattern} {action} {scope}")
+        scope_value = "" if scope == "global" else _norm(scope_value)
+        with self.lock:
+            self._ensure_loaded()
+            conn = self._get_conn()
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO user_rules (kind, pattern, action, scope, scope_value, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                           (kind, pattern.strip(), action, scope, scope_value, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            conn.commit()
+            rule = Rule(cursor.lastrowid, kind, pattern.strip(), action, scope, scope_value)
+            self._compile(self.rules + [rule])
+            return rule
+
+    def remove_rule(self, rule_id):
+        with self.lock:
+            self._ensure_loaded()
+            conn = self._get_conn()
+            conn.execute("DELETE FROM user_rules WHERE id = ?", (rule_id,))
+            conn.commit()
+            self._compile([r for r in self.rules if r.id != rule_id])
+
+    def match(self, main_goal, sub_goal, title, process, exe=""):
+        """返回命中的规则 (作用域越具体越优先，同级取最新)，没有则返回 None"""
+        with self.lock:
+            self._ensure_loaded()
+            by_process, by_term, matcher = self.by_process, self.by_term, self.term_matcher
+        candidates = list(by_process.get(norm_process(process), []))
+        if exe:
+            # 应用规则也可以写可执行文件名或完整路径
+            for key in {norm_process(os.path.basename(exe)), _norm(exe)} - {norm_process(process)}:
+                candidates.extend(by_process.get(key, []))
+        if matcher:
+            for term in matcher.search_all(title or ""):
+                candidates.extend(by_term.get(_norm(term), []))
+        if not candidates: return None
+
+        goal, step = _norm(main_goal), _norm(sub_goal)
+        best = None
+        for r in candidates:
+            if r.scope == "goal" and r.scope_value != goal: continue
+            if r.scope == "step" and r.scope_value != step: continue
+            if best is None or (_SCOPE_RANK[r.scope], r.id) > (_SCOPE_RANK[best.scope], best.id):
+                best = r
+        return best
+
+
+# Singleton instance
+RULES = RuleStore()
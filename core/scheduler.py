@@ -0,0 +1,58 @@
+from collections import deque
+from core.config import CONFIG
+
+BACKOFF = 1.5        # 前台稳定时每次采样间隔放大的倍数
+SWITCH_WINDOW = 60   # 统计窗口切换频率的时间窗口 (秒)
+
+
+class AdaptiveInterval:
+    """
+    自适应采样/重判节奏。
+    - 采样间隔：窗口切换后立即回到下限，前台稳定时按 BACKOFF 逐步放大；
+      最近切换越频繁、上一次判定越不确定，上限就越低。
+    - 重判间隔：同一窗口的判定置信度高时逐次翻倍，不确定或切换窗口后回到下限。
+    """
+    def __init__(self):
+        self.floor = CONFIG.get("sample_interval_min")
+        self.ceiling = max(CONFIG.get("sample_interval_max"), self.floor)
+        self.rejudge_floor = CONFIG.get("rejudge_interval_min")
+        self.rejudge_ceiling = max(CONFIG.get("rejudge_interval_max"), self.rejudge_floor)
+        self.switches = deque()  # 最近的窗口切换时间戳
+        self.sample_interval = self.floor
+        self.rejudge_interval = self.rejudge_floor
+        self.confident = False
+
+    @property
+    def current_interval(self):
+        """当前采样间隔 (秒)"""
+        return self.sample_interval
+
+    def observe(self, switched, now):
+        """每次采样调用一次，返回下一次采样前应等待的秒数"""
+        while self.switches and now - self.switches[0] > SWITCH_WINDOW:
+            self.switches.popleft()
+        if switched:
+            self.switches.append(now)
+            self.sample_interval = self.floor
+            self.rejudge_interval = self.rejudge_floor
+            self.confident = False
+        else:
+            cap = self.ceiling / (1 + len(self.switches))
+            if not self.confident: cap /= 2
+            self.sample_interval = min(self.sample_interval * BACKOFF, max(cap, self.floor))
+        return self.sample_interval
+
+    def on_verdict(self, confidence):
+        """当前窗口得到判定结果；confidence 为 None 表示无法给出结论 (加载中/接口失败)"""
+        self.confident = confidence is not None and confidence >= CONFIG.get("cascade_threshold")
+        if self.confident:
+            self.rejudge_interval = min(self.rejudge_interval * 2, self.rejudge_ceiling)
+        else:
+            self.rejudge_interval = self.rejudge_floor
+
+    def stats(self):
+        return {
+            "sample_interval": round(self.sample_interval, 2),
+            "rejudge_interval": round(self.rejudge_interval, 2),
+            "switches_per_min": len(self.switches) * 60 / SWITCH_WINDOW,
+        }
@@ -0,0 +1,85 @@
+import threading
+from collections import deque, namedtuple
+
+Span = namedtuple("Span", "process title distracted start_ts end_ts")
+
+FLUSH_INTERVAL = 30  # 后台线程每隔多少秒合并一次采样并批量写入
+
+
+class TimelineRecorder:
+    """
+    前台活动时间线：把每次前台变化记录为一段 (进程名, 归一化标题, 判定, 开始, 结束)。
+    采样线程里只做一次 deque.append (record / verdict / gap)，
+    合并为连续片段和写库都在后台线程中完成，按 FLUSH_INTERVAL 批量交给 sink。
+    sink(spans) 负责持久化，一般为 DatabaseManager.log_spans。
+    """
+    def __init__(self, sink, flush_interval=FLUSH_INTERVAL):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.events = deque()  # (时间, 进程名, 标题, 判定)；进程名为 None 表示判定或中断标记
+        self.span = None       # 当前未结束的片段 [process, title, distracted, start, end]
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+
+    # ---------- 采样线程调用 (只追加，不做 IO) ----------
+
+    def record(self, t, process, title):
+        self.events.append((t, process, title, None))
+
+    def verdict(self, t, title, distracted):
+        """判定结果，只作用于标题相同的当前片段"""
+        self.events.append((t, None, title, distracted))
+
+    def gap(self, t):
+        """暂停/离开：在 t 结束当前片段，之后的时间不计入时间线"""
+        self.events.append((t, None, None, None))
+
+    # ---------- 后台合并与写入 ----------
+
+    def _fold(self):
+        """把已有事件合并为片段，返回已经结束的片段列表"""
+        done = []
+        events = self.events
+        while events:
+            t, process, title, distracted = events.popleft()
+            span = self.span
+            if process is not None:
+                if span and span[0] == process and span[1] == title:
+                    span[4] = t
+                    continue
+                if span: done.append(self._close(span, t))
+                self.span = [process, title, None, t, t]
+            elif title is not None:
+                if span and span[1] == title: span[2] = distracted
+            elif span:
+                done.append(self._close(span, t))
+                self.span = None
+        return done
+
+    @staticmethod
+    def _close(span, t):
+        process, title, distracted, start, _ = span
+        return Span(process, title, distracted, start, max(t, start))
+
+    def flush(self, final=False):
+        spans = self._fold()
+        if final and self.span:
+            # 退出时最后一段以最后一次采样为结束时间
+            spans.append(self._close(self.span, self.span[4]))
+            self.span = None
+        if spans:
+            try:
+                self.sink(spans)
+            except Exception as e:
+                print(f"Timeline flush error: {e}")
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self):
+        """停止后台线程并写入剩余片段"""
+        self.stop_event.set()
+        self.thread.join(2)
+        self.flush(final=True)
@@ -0,0 +1,57 @@
+import re
+from core.config import CONFIG
+
+# 内置规则：(进程名匹配, 标题正则, 替换)。进程名为 None 表示对所有应用生效
+BUILTIN_RULES = [
+    # 未读计数："(3) YouTube"、"[12] Inbox"、"(99+) 微信"
+    (None, r"^\s*[\(\[]\d+\+?[\)\]]\s*", ""),
+    # 未读提示："3 条未读"、"(2 unread)"、"· 5 new messages"
+    (None, r"[\(\[（]?\s*\d+\+?\s*(条未读|条新消息|unread|new messages?|notifications?)\s*[\)\]）]?", ""),
+    # 编辑器未保存标记："● file.py - VS Code"、"file.py * - Sublime"
+    (None, r"^\s*[●•◦*]\s*", ""),
+    (None, r"\s\*(?=\s-\s)", ""),
+    # 播放进度："0:35 / 10:20"、"1:02:03"
+    (None, r"\d{1,2}:\d{2}(:\d{2})?(\s*/\s*\d{1,2}:\d{2}(:\d{2})?)?", ""),
+    # 浏览器后缀与用户配置名："xxx - Google Chrome - Work"
+    (r"chrome|msedge|edge|firefox|safari|brave|arc", r"\s[-—–]\s(Google Chrome|Microsoft Edge|Mozilla Firefox|Safari|Brave|Arc)(\s[-—–]\s.*)?$", ""),
+    # 音乐播放器："▶ 歌名"、"⏸ 歌名"
+    (r"spotify|music|netease|qqmusic|cloudmusic", r"^[▶⏸►❚\s]+", ""),
+]
+
+
+class TitleCanonicalizer:
+    """
+    将频繁变化的窗口标题归一化为稳定的 key。
+    规则按顺序执行，用户规则来自 config.json 的 title_rules：
+    [{"pattern": "...", "replace": "", "process": "可选的进程名正则"}]
+    """
+    def __init__(self, user_rules=None):
+        self.rules = []
+        for proc, pattern, repl in BUILTIN_RULES:
+            self.add_rule(pattern, repl, proc)
+        for r in (user_rules if user_rules is not None else CONFIG.get("title_rules", [])):
+            try:
+                self.add_rule(r["pattern"], r.get("replace", ""), r.get("process"))
+            except (KeyError, re.error) as e:
+                print(f"Invalid title rule {r}: {e}")
+
+    def add_rule(self, pattern, repl="", process=None):
+        proc_re = re.compile(process, re.I) if process else None
+        self.rules.append((proc_re, re.compile(pattern, re.I), repl))
+
+    def canonicalize(self, title, process=""):
+        t = title or ""
+        for proc_re, pattern, repl in self.rules:
+            if proc_re and not proc_re.search(process or ""): continue
+            t = pattern.sub(repl, t)
+        t = " ".join(t.split()).strip(" -—–|·")
+        # 全部被清空时退回原标题，避免不同窗口塌缩成同一个空 key
+        return t or (title or "").strip()
+
+
+# Singleton instance
+CANONICALIZER = TitleCanonicalizer()
+
+
+def canonicalize(title, process=""):
+    return CANONICALIZER.canonicalize(title, process)
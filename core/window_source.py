@@ -0,0 +1,260 @@
+import os
+import select
+import sys
+import threading
+from collections import namedtuple
+from core.procinfo import PROCESS_CACHE
+
+WindowInfo = namedtuple("WindowInfo", "title process pid exe")
+UNKNOWN = WindowInfo("Unknown", "Unknown", 0, "")
+
+# Platform-specific imports
+if sys.platform == 'darwin':  # macOS
+    try:
+        from Quartz import (
+            CGWindowListCopyWindowInfo,
+            kCGWindowListOptionOnScreenOnly,
+            kCGNullWindowID
+        )
+        from AppKit import NSWorkspace
+        PLATFORM_SUPPORTED = True
+    except ImportError:
+        PLATFORM_SUPPORTED = False
+        print("Warning: macOS window monitoring requires pyobjc. Install with: pip install pyobjc-framework-Quartz pyobjc-framework-AppKit")
+elif sys.platform == 'win32':  # Windows
+    try:
+        import win32gui
+        import win32process
+        PLATFORM_SUPPORTED = True
+    except ImportError:
+        PLATFORM_SUPPORTED = False
+        print("Warning: Windows window monitoring requires pywin32. Install with: pip install pywin32")
+elif sys.platform.startswith('linux') and os.environ.get("DISPLAY"):  # Linux X11
+    try:
+        from Xlib import X, Xatom, display as xdisplay, error as xerror
+        PLATFORM_SUPPORTED = True
+    except ImportError:
+        PLATFORM_SUPPORTED = False
+        print("Warning: X11 window monitoring requires python-xlib. Install with: pip install python-xlib")
+else:
+    PLATFORM_SUPPORTED = False
+    print(f"Warning: Window monitoring not supported on platform: {sys.platform}")
+
+
+def _process(pid, default="Unknown"):
+    """通过 pid 缓存取 (进程名, 可执行文件路径)"""
+    info = PROCESS_CACHE.lookup(pid)
+    return (info.name, info.exe) if info else (default, "")
+
+
+class WindowSource:
+    """
+    前台窗口来源接口。
+    - current(): 返回当前前台窗口 WindowInfo
+    - start(on_change): 事件驱动的实现在窗口/标题变化时回调 on_change()，轮询实现忽略
+    - event_driven: 为 True 时监督线程无需按秒轮询
+    """
+    supported = True
+    event_driven = False
+
+    def start(self, on_change):
+        pass
+
+    def current(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class UnsupportedWindowSource(WindowSource):
+    supported = False
+
+    def current(self):
+        return UNKNOWN
+
+
+class MacWindowSource(WindowSource):
+    """macOS 轮询实现 (NSWorkspace + Quartz)"""
+    def current(self):
+        # Get active application
+        workspace = NSWorkspace.sharedWorkspace()
+        active_app = workspace.activeApplication()
+        app_name = active_app.get('NSApplicationName', 'Unknown')
+        pid = active_app.get('NSApplicationProcessIdentifier', 0)
+
+        # Get window title from frontmost window
+        window_list = CGWindowListCopyWindowInfo(
+            kCGWindowListOptionOnScreenOnly,
+            kCGNullWindowID
+        )
+
+        title = ""
+        for window in window_list:
+            window_pid = window.get('kCGWindowOwnerPID', 0)
+            if window_pid == pid:
+                window_layer = window.get('kCGWindowLayer', 0)
+                if window_layer == 0:  # Normal window layer
+                    title = window.get('kCGWindowName', '')
+                    if title:
+                        break
+
+        if not title:
+            title = app_name
+
+        proc, exe = _process(pid, app_name)
+        return WindowInfo(title, proc, pid, exe)
+
+
+class Win32WindowSource(WindowSource):
+    """Windows 轮询实现 (pywin32)"""
+    def current(self):
+        hwnd = win32gui.GetForegroundWindow()
+        title = win32gui.GetWindowText(hwnd)
+        _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        proc, exe = _process(pid, "System")
+        return WindowInfo(title, proc, pid, exe)
+
+
+class X11WindowSource(WindowSource):
+    """
+    Linux X11 实现：订阅根窗口 _NET_ACTIVE_WINDOW 和当前窗口 _NET_WM_NAME 的 PropertyNotify 事件，
+    窗口切换/标题变化时立即回调，空闲时几乎不占 CPU。
+    事件线程启动失败时退化为每次 current() 直接查询 (轮询)。
+    """
+    event_driven = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.info = None
+        self.running = False
+        self.thread = None
+        self.on_change = None
+        self.poll_conn = None  # 轮询退化时复用的连接 (仅在采样线程中使用)
+
+    def _open(self):
+        d = xdisplay.Display()
+        atoms = {name: d.intern_atom(name) for name in ("_NET_ACTIVE_WINDOW", "_NET_WM_NAME", "_NET_WM_PID", "UTF8_STRING")}
+        return d, d.screen().root, atoms
+
+    def _query(self, d, root, atoms):
+        """读取当前活动窗口的标题和 pid，返回 (WindowInfo, window)"""
+        prop = root.get_full_property(atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+        wid = prop.value[0] if prop and len(prop.value) else 0
+        if not wid:
+            return UNKNOWN, None
+        win = d.create_resource_object('window', wid)
+        name = win.get_full_property(atoms["_NET_WM_NAME"], atoms["UTF8_STRING"])
+        if name and name.value:
+            title = name.value.decode("utf-8", "replace") if isinstance(name.value, bytes) else str(name.value)
+        else:
+            title = win.get_wm_name() or ""
+            if isinstance(title, bytes): title = title.decode("latin-1", "replace")
+        pid_prop = win.get_full_property(atoms["_NET_WM_PID"], Xatom.CARDINAL)
+        pid = int(pid_prop.value[0]) if pid_prop and len(pid_prop.value) else 0
+        proc, exe = _process(pid)
+        return WindowInfo(title or proc, proc, pid, exe), win
+
+    def start(self, on_change):
+        self.on_change = on_change
+        self.running = True
+        self.thread = threading.Thread(target=self._event_loop, daemon=True)
+        self.thread.start()
+
+    def _event_loop(self):
+        try:
+            d, root, atoms = self._open()
+            root.change_attributes(event_mask=X.PropertyChangeMask)
+        except Exception as e:
+            print(f"X11 event subscription failed, falling back to polling: {e}")
+            self.event_driven = False
+            return
+
+        def refresh():
+            try:
+                info, win = self._query(d, root, atoms)
+                if win is not None:
+                    # 订阅当前窗口的属性变化，以便捕获标题变化
+                    win.change_attributes(event_mask=X.PropertyChangeMask)
+            except xerror.XError:
+                info = UNKNOWN  # 窗口已销毁
+            with self.lock:
+                changed = info != self.info
+                self.info = info
+            if changed and self.on_change: self.on_change()
+
+        title_atoms = (atoms["_NET_WM_NAME"], Xatom.WM_NAME)
+        refresh()
+        while self.running:
+            readable, _, _ = select.select([d], [], [], 0.5)
+            if not readable and not d.pending_events(): continue
+            dirty = False
+            while d.pending_events():
+                ev = d.next_event()
+                if ev.type != X.PropertyNotify: continue
+                if ev.window == root and ev.atom == atoms["_NET_ACTIVE_WINDOW"]:
+                    dirty = True
+                elif ev.atom in title_atoms:
+                    dirty = True
+            if dirty: refresh()
+        d.close()
+
+    def current(self):
+        with self.lock:
+            info = self.info
+        if info is not None and self.event_driven:
+            return info
+        # 事件线程尚未就绪或不可用：直接查询
+        if self.poll_conn is None:
+            self.poll_conn = self._open()
+        try:
+            return self._query(*self.poll_conn)[0]
+        except xerror.XError:
+            return UNKNOWN
+
+    def stop(self):
+        self.running = False
+
+
+class FakeWindowSource(WindowSource):
+    """
+    脚本化的假窗口来源，用于测试：
+    FakeWindowSource([(0, "main.py - VS Code", "Code"), (2.5, "YouTube", "chrome")])
+    每项为 (相对 start() 的秒数, 标题, 进程名)；也可以用 push() 手动切换。
+    """
+    event_driven = True
+
+    def __init__(self, script=None):
+        self.script = sorted(script or [], key=lambda x: x[0])
+        self.info = UNKNOWN
+        self.on_change = None
+        self.timers = []
+
+    def start(self, on_change):
+        self.on_change = on_change
+        for at, title, proc in self.script:
+            timer = threading.Timer(at, self.push, args=(title, proc))
+            timer.daemon = True
+            timer.start()
+            self.timers.append(timer)
+
+    def push(self, title, process, pid=0, exe=""):
+        self.info = WindowInfo(title, process, pid, exe)
+        if self.on_change: self.on_change()
+
+    def current(self):
+        return self.info
+
+    def stop(self):
+        for timer in self.timers: timer.cancel()
+
+
+def create_window_source():
+    """按平台选择前台窗口来源"""
+    if not PLATFORM_SUPPORTED:
+        return UnsupportedWindowSource()
+    if sys.platform == 'darwin':
+        return MacWindowSource()
+    if sys.platform == 'win32':
+        return Win32WindowSource()
+    return X11WindowSource()
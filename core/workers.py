@@ -1,91 +1,18 @@
 import time
-import sys
-import psutil
+import threading
+from collections import namedtuple, deque
 from PyQt6.QtCore import QThread, pyqtSignal
 from core.ai import AIGuardian
-
-# Platform-specific imports
-if sys.platform == 'darwin':  # macOS
-    try:
-        from Quartz import (
-            CGWindowListCopyWindowInfo,
-            kCGWindowListOptionOnScreenOnly,
-            kCGNullWindowID
-        )
-        from AppKit import NSWorkspace
-        PLATFORM_SUPPORTED = True
-    except ImportError:
-        PLATFORM_SUPPORTED = False
-        print("Warning: macOS window monitoring requires pyobjc. Install with: pip install pyobjc-framework-Quartz pyobjc-framework-AppKit")
-elif sys.platform == 'win32':  # Windows
-    try:
-        import win32gui
-        import win32process
-        PLATFORM_SUPPORTED = True
-    except ImportError:
-        PLATFORM_SUPPORTED = False
-        print("Warning: Windows window monitoring requires pywin32. Install with: pip install pywin32")
-else:
-    PLATFORM_SUPPORTED = False
-    print(f"Warning: Window monitoring not supported on platform: {sys.platform}")
-
-
-def get_active_window_info():
-    """Get active window title and process name in a cross-platform way"""
-    if not PLATFORM_SUPPORTED:
-        return "Unknown", "Unknown"
-    
-    try:
-        if sys.platform == 'darwin':  # macOS
-            # Get active application
-            workspace = NSWorkspace.sharedWorkspace()
-            active_app = workspace.activeApplication()
-            app_name = active_app.get('NSApplicationName', 'Unknown')
-            pid = active_app.get('NSApplicationProcessIdentifier', 0)
-            
-            # Get window title from frontmost window
-            window_list = CGWindowListCopyWindowInfo(
-                kCGWindowListOptionOnScreenOnly,
-                kCGNullWindowID
-            )
-            
-            title = ""
-            for window in window_list:
-                window_pid = window.get('kCGWindowOwnerPID', 0)
-                if window_pid == pid:
-                    window_layer = window.get('kCGWindowLayer', 0)
-                    if window_layer == 0:  # Normal window layer
-                        title = window.get('kCGWindowName', '')
-                        if title:
-                            break
-            
-            if not title:
-                title = app_name
-            
-            # Get process name
-            try:
-                proc = psutil.Process(pid).name()
-            except:
-                proc = app_name
-            
-            return title, proc
-            
-        elif sys.platform == 'win32':  # Windows
-            hwnd = win32gui.GetForegroundWindow()
-            title = win32gui.GetWindowText(hwnd)
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            try:
-                proc = psutil.Process(pid).name()
-            except:
-                proc = "System"
-            return title, proc
-            
-    except Exception as e:
-        print(f"Error getting active window: {e}")
-        return "Unknown", "Unknown"
-    
-    return "Unknown", "Unknown"
-
+from core.config import CONFIG
+from core.cache import VERDICT_CACHE
+from core.classifier import CLASSIFIER
+from core.titles import canonicalize
+from core.dwell import DwellTracker
+from core.window_source import create_window_source
+from core.idle import create_idle_detector
+from core.scheduler import AdaptiveInterval
+from core.episodes import EpisodeTracker
+from core import focusmap
 
 class PlannerThread(QThread):
     result_signal = pyqtSignal(list)
@@ -94,51 +21,335 @@ class PlannerThread(QThread):
         self.goal = goal
         self.ai = AIGuardian()
     def run(self): 
-        self.result_signal.emit(self.ai.smart_planner(self.goal))
+        tasks = self.ai.smart_planner(self.goal)
+        # 规划完成即为所有步骤预生成画像，切换步骤时无需再等待网络
+        profiles = self.ai.build_task_profiles(self.goal, [t.get("step", "") for t in tasks])
+        for t, profile in zip(tasks, profiles):
+            t["profile"] = profile
+        self.result_signal.emit(tasks)
+
+
+JudgeRequest = namedtuple("JudgeRequest", "main_goal sub_goal title proc key exe")
+
+
+class JudgePool:
+    """
+    判定工作池：采样线程只负责投递请求，LLM 调用在这里的后台线程完成。
+    队列只保留最新的一条请求 (latest-wins)，被覆盖的旧请求直接丢弃。
+    """
+    def __init__(self, ai, on_result, workers=2):
+        self.ai = ai
+        self.on_result = on_result
+        self.cond = threading.Condition()
+        self.latest = None
+        self.running = True
+        self.dropped = 0  # 尚未执行就被覆盖的请求数
+        self.threads = [threading.Thread(target=self._work, daemon=True) for _ in range(max(1, workers))]
+        for th in self.threads: th.start()
+
+    def submit(self, req):
+        with self.cond:
+            if self.latest is not None: self.dropped += 1
+            self.latest = req
+            self.cond.notify()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while self.running and self.latest is None:
+                    self.cond.wait()
+                if not self.running: return
+                req, self.latest = self.latest, None
+            try:
+                verdict = self.ai.judge(req.main_goal, req.sub_goal, req.title, req.proc, req.exe)
+                self.on_result(req, verdict, self.ai.last_confidence)
+            except Exception as e:
+                print(f"Judge error: {e}")
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.latest = None
+            self.cond.notify_all()
 
 
 class MonitorThread(QThread):
+    """
+    常驻监督服务：整个程序生命周期内只有一个实例。
+    通过 set_goal / pause / resume 切换状态，client、缓存和画像在步骤之间保留。
+    """
     update_signal = pyqtSignal(str, str, bool, str)
-    def __init__(self, main_goal, sub_goal): 
+    idle_signal = pyqtSignal(float, float)  # 一段离开结束时发出 (开始时间戳, 结束时间戳)
+    away_signal = pyqtSignal()  # 判定为离开时发出 (适合做后台维护)
+    episode_signal = pyqtSignal(str, str, str, float, float)  # 一段分心结束时发出 (进程名, 归一化标题, 原因, 开始, 结束)
+    def __init__(self, source=None, idle=None, timeline=None, focus_map=None): 
         super().__init__()
-        self.main_goal = main_goal
-        self.sub_goal = sub_goal
+        # 前台活动时间线 (TimelineRecorder) / 每秒状态图 (FocusMap)，为 None 时不记录
+        self.timeline = timeline
+        self.focus_map = focus_map
+        self.map_last = None  # 状态图已经写到的时间 (监督中)，None 表示暂停/离开
+        self.paused_since = None
+        # 前台窗口来源 / 空闲检测，测试时可传入 FakeWindowSource / FakeIdleDetector
+        self.source = source or create_window_source()
+        self.idle = idle or create_idle_detector()
+        self.idle_since = None  # 当前离开开始的时间戳，None 表示用户在场
+        self.goal = ("", "")  # (main_goal, sub_goal)，整体替换保证读写原子
         self.running = True
+        self.paused = True
         self.ai = AIGuardian()
+        self.profiles = {}  # (main_goal, sub_goal) -> profile，暂停/恢复/回到旧步骤时不再请求 LLM
+        self.wake = threading.Event()
         self.last_check = (0, "")
+        self.current_key = None  # 当前前台窗口 (归一化后)，用于丢弃过期的判定结果
+        self.current_since = 0  # 当前前台窗口切到前台的时间
+        self.episodes = EpisodeTracker()
+        # 判定结果在 JudgePool 线程中应用，与界面线程的 pause / set_goal 互斥：
+        # 否则通过"未暂停"检查后、mark 之前被暂停，会开出一个跨越暂停的分心片段
+        self.lock = threading.RLock()
+        self.stale = 0
+        # 防抖：新窗口需在前台停留 title_dwell_ms 才会送去判定
+        self.candidate = None  # (key, first_seen, proc, title)
+        self.suppressed = 0  # 因停留过短而省下的判定次数
+        self.passed_through = deque(maxlen=50)  # 最近一闪而过的窗口 (first_seen, proc, title)
+        # 停留累加：非必要应用累计停留达到 alert_dwell_seconds 才判定/提醒
+        self.dwell = DwellTracker()
+        # 自适应节奏：前台稳定且判定确定时放慢采样和重判，频繁切换时加快
+        self.scheduler = AdaptiveInterval()
+        self.judges = JudgePool(self.ai, self._on_verdict, CONFIG.get("judge_workers"))
+
+    @property
+    def main_goal(self): return self.goal[0]
+
+    @property
+    def sub_goal(self): return self.goal[1]
+
+    def set_goal(self, main_goal, sub_goal, profile=None):
+        """切换监督目标；profile 为规划时预生成的画像，有则直接使用"""
+        goal = (main_goal, sub_goal)
+        if profile: self.profiles[goal] = profile
+        if goal == self.goal: return
+        with self.lock:
+            self.close_episode()  # 分心片段不跨步骤
+            self.goal = goal
+            self.last_check = (0, "")
+        profile = self.profiles.get(goal)
+        if profile:
+            self.ai.set_profile(profile)
+        else:
+            self.ai.current_profile = None  # 画像加载前 judge 返回"加载中..."
+            threading.Thread(target=self._load_profile, args=(goal,), daemon=True).start()
+
+    def _load_profile(self, goal):
+        profile = self.ai.build_task_profile(*goal)
+        self.profiles[goal] = profile
+        if goal == self.goal:
+            self.ai.set_profile(profile)
+
+    def pause(self):
+        with self.lock:
+            now = time.time()
+            self.paused = True
+            self.dwell.reset()
+            self.close_episode()
+            if self.timeline: self.timeline.gap(now)
+            self._map_focus(now)
+            self.map_last = None
+            if self.sub_goal: self.paused_since = now
+            self._end_idle(time.time())
+
+    def close_episode(self, at=None):
+        """结束当前分心片段 (如有)，暂停/结束会话前调用"""
+        self._emit_episode(self.episodes.close(at if at is not None else time.time()))
+
+    def _emit_episode(self, episode):
+        if episode:
+            if self.focus_map:
+                # 片段覆盖之前按"专注"写入的秒数
+                self.focus_map.fill(episode.start_ts, episode.end_ts, focusmap.DISTRACTED)
+                if self.map_last is not None: self.map_last = max(self.map_last, episode.end_ts)
+            self.episode_signal.emit(episode.process, episode.title, episode.reason, episode.start_ts, episode.end_ts)
+
+    def _map_focus(self, t):
+        """监督中、未分心的时间先记为专注，分心片段结束时再覆盖"""
+        if self.focus_map and self.map_last is not None and t > self.map_last:
+            self.focus_map.fill(self.map_last, t, focusmap.FOCUS)
+            self.map_last = t
+
+    def _check_idle(self):
+        """
+        返回距离判定为离开还剩多少秒 (<= 0 表示用户已离开)。
+        进入/结束离开时更新状态并记录离开时段；未开启检测时返回 None。
+        """
+        timeout = CONFIG.get("idle_timeout")
+        if not timeout or not self.idle.supported: return None
+        idle = self.idle.idle_seconds()
+        now = time.time()
+        if idle >= timeout:
+            if self.idle_since is None:
+                # 与 _on_verdict 互斥：进入离开后仍在途的判定结果会被丢弃，不会重新打开片段
+                with self.lock:
+                    # 离开从最后一次输入算起，而不是从检测到超时算起
+                    self.idle_since = now - idle
+                    self.candidate = None
+                    self.dwell.reset()
+                    self.close_episode(self.idle_since)  # 离开期间不算分心
+                    if self.timeline: self.timeline.gap(self.idle_since)
+                    self._map_focus(self.idle_since)
+                    self.map_last = None
+                self.away_signal.emit()
+            return 0
+        self._end_idle(now - idle)
+        return timeout - idle
+
+    def _end_idle(self, end):
+        if self.idle_since is None: return
+        start, self.idle_since = self.idle_since, None
+        self.last_check = (0, "")  # 回来后立即重新判定当前窗口
+        end = max(end, start)
+        # 回来后在同一窗口上的分心从回来时算起，不包含离开时段
+        self.current_since = max(self.current_since, end)
+        if self.focus_map:
+            self.focus_map.fill(start, end, focusmap.IDLE)
+            if not self.paused: self.map_last = end
+        self.idle_signal.emit(start, end)
+
+    def resume(self):
+        with self.lock:
+            now = time.time()
+            if self.focus_map and self.paused_since:
+                self.focus_map.fill(self.paused_since, now, focusmap.PAUSED)
+            self.paused_since = None
+            self.map_last = now
+            # 恢复后在同一窗口上的分心从恢复时算起，不包含暂停时段
+            self.current_since = now
+            self.paused = False
+            self.last_check = (0, "")  # 恢复后立即重新判定当前窗口
+        self.wake.set()
+
+    def _drop_candidate(self, key):
+        """前台切到了别的窗口，尚未达到停留时间的候选窗口记为"路过"，不做判定"""
+        if self.candidate and self.candidate[0] != key:
+            self.suppressed += 1
+            self.passed_through.append(self.candidate[1:])
+            self.candidate = None
+
+    @property
+    def current_interval(self):
+        """当前采样间隔 (秒)，供界面/调试查看"""
+        return self.scheduler.current_interval
+
+    def _on_verdict(self, req, verdict, confidence=None):
+        with self.lock:
+            # 判定返回时窗口已经切走、步骤已变、已暂停或用户已离开，结果作废
+            if req.key != self.current_key or req.sub_goal != self.sub_goal or self.paused or self.idle_since is not None:
+                self.stale += 1
+                return
+            if not self.running: return
+            self._apply_verdict(req.key, req.proc, req.title, verdict, confidence, time.time())
+
+    def _apply_verdict(self, key, proc, title, verdict, confidence, now):
+        """应用一条判定，调用方需持有 self.lock 并已确认未暂停、未离开"""
+        self.scheduler.on_verdict(confidence)
+        is_d, reason = verdict
+        self._emit_episode(self.episodes.mark(key, proc, key, reason, is_d, self.current_since, now))
+        if self.timeline: self.timeline.verdict(now, key, is_d)
+        self.update_signal.emit(proc, title, is_d, reason)
         
+    def _submit(self, info, canon, t):
+        # 只投递不等待，采样节奏不受 API 延迟影响
+        main_goal, sub_goal = self.goal
+        self.judges.submit(JudgeRequest(main_goal, sub_goal, info.title, info.process, canon, info.exe))
+        self.last_check = (t, canon)
+
     def run(self):
-        if not PLATFORM_SUPPORTED:
-            # Gracefully degrade - emit a message and stop
-            self.update_signal.emit("System", "Window monitoring not available", False, "Platform not supported")
-            return
-            
-        self.ai.create_task_profile(self.main_goal, self.sub_goal)
+        # 事件驱动的来源在窗口变化时直接唤醒采样
+        self.source.start(self.wake.set)
         while self.running:
+            if self.paused or not self.sub_goal:
+                self.wake.wait(1); self.wake.clear()
+                continue
+
+            until_idle = self._check_idle()
+            if until_idle is not None and until_idle <= 0:
+                # 离开期间不采样也不调用 LLM，只按秒检查是否有输入
+                self.wake.wait(1); self.wake.clear()
+                continue
+
+            if not self.source.supported:
+                # Gracefully degrade - emit a message and wait for the next resume
+                self.update_signal.emit("System", "Window monitoring not available", False, "Platform not supported")
+                self.paused = True
+                continue
+
             try:
-                title, proc = get_active_window_info()
+                info = self.source.current()
+                title, proc = info.title, info.process
+                t = time.time()
+                # 用归一化后的标题做变化检测，"(3) YouTube" -> "(4) YouTube" 不算切换
+                canon = canonicalize(title, proc)
+                if canon != self.current_key: self.current_since = t
+                wait = self.scheduler.observe(canon != self.current_key, t)
+                # 事件驱动时无需轮询，只需按重新判定/停留累计的节奏醒来
+                if self.source.event_driven: wait = self.scheduler.rejudge_interval
+                self.current_key = canon
+                if self.timeline: self.timeline.record(t, proc, canon)
+                self._map_focus(t)
+                left = self.episodes.leave(canon, t)
+                self._emit_episode(left)
+                self._drop_candidate(canon)
+                dwell = self.dwell.observe(DwellTracker.make_key(proc, canon), t)
                 
                 # 白名单逻辑优化：显式发送"安全"信号，以便UI能清除Distraction状态
                 proc_lower = proc.lower()
                 if "flowmate" in proc_lower or "python" in proc_lower or "FlowMate" in title:
                     self.update_signal.emit(proc, title, False, "FlowMate Safe")
-                    self.last_check = (time.time(), title)
-                    time.sleep(1)
-                    continue
-
-                t = time.time()
-                
-                if title != self.last_check[1] or t - self.last_check[0] > 5:
-                    is_d, reason = self.ai.judge(self.main_goal, self.sub_goal, title, proc)
-                    self.update_signal.emit(proc, title, is_d, reason)
-                    self.last_check = (t, title)
+                    self.scheduler.on_verdict(1.0)
+                    self.last_check = (t, canon)
+                elif canon == self.last_check[1]:
+                    since = t - self.last_check[0]
+                    if since >= self.scheduler.rejudge_interval:
+                        self._submit(info, canon, t)
+                    else:
+                        wait = min(wait, self.scheduler.rejudge_interval - since)
+                else:
+                    quick = self.ai.quick_judge(self.main_goal, self.sub_goal, title, proc, info.exe)
+                    if quick:
+                        # 规则/系统/画像判定不花钱，新窗口立即给出结论 (切回工作窗口时马上解除分心状态)
+                        self.candidate = None
+                        self.last_check = (t, canon)
+                        with self.lock:
+                            if not self.paused: self._apply_verdict(canon, proc, title, quick, 1.0, t)
+                    else:
+                        if not self.candidate:
+                            self.candidate = (canon, t, proc, title)
+                        # 只有需要模型判定的窗口才等待：同时满足防抖时间和累计停留阈值才送去判定
+                        remaining = max(CONFIG.get("title_dwell_ms") / 1000 - (t - self.candidate[1]),
+                                        CONFIG.get("alert_dwell_seconds") - dwell)
+                        if remaining <= 0:
+                            self.candidate = None
+                            self._submit(info, canon, t)
+                        else:
+                            if left: self.update_signal.emit(proc, title, False, "观察中")  # 已离开分心窗口，先解除提醒状态
+                            wait = min(wait, remaining)  # 到达停留时间时再采样一次
             except Exception as e:
                 print(f"Monitor error: {e}")
-                pass
-            time.sleep(1)
+                wait = 1
+            if until_idle is not None:
+                wait = min(wait, max(until_idle, 1))  # 到达空闲阈值时及时醒来
+            # 用 Event 代替 sleep，pause/stop 可以立即生效
+            self.wake.wait(wait); self.wake.clear()
+        self.source.stop()
+        self.judges.stop()
+        if self.timeline: self.timeline.stop()
+        if self.focus_map:
+            self._map_focus(time.time())
+            self.focus_map.close()
+        print(f"Verdict cache: {VERDICT_CACHE.stats()}, judge dropped/stale/suppressed: {self.judges.dropped}/{self.stale}/{self.suppressed}, schedule: {self.scheduler.stats()}")
+        CLASSIFIER.flush()
             
     def stop(self): 
         self.running = False
+        self.wake.set()
 
 
 class ReportThread(QThread):
@@ -0,0 +1,163 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+# 在导入 core 之前设置：模拟模式 (不请求 LLM)、无界面的 Qt，数据库/配置文件写到临时目录
+os.environ["FLOWMATE_MOCK_MODE"] = "true"
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.TemporaryDirectory()
+os.chdir(_TMP.name)
+
+from PyQt6.QtCore import QCoreApplication, Qt
+from core.config import CONFIG
+from core.focusmap import FocusMap, NUMPY_AVAILABLE
+from core.idle import FakeIdleDetector
+from core.window_source import FakeWindowSource
+from core.workers import JudgeRequest, MonitorThread
+
+APP = QCoreApplication.instance() or QCoreApplication([])
+GOAL = ("写一个脚本", "写代码")
+PROFILE = {"allowed_tools": ["VS Code"], "keywords": []}
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond(): return True
+        time.sleep(0.05)
+    return False
+
+
+class MonitorThreadTest(unittest.TestCase):
+    """用 FakeWindowSource / FakeIdleDetector 驱动真实的 MonitorThread (无需显示器)"""
+
+    def setUp(self):
+        self.saved = dict(CONFIG.config)
+        CONFIG.config.update({"alert_dwell_seconds": 1, "title_dwell_ms": 100, "idle_timeout": 60})
+        self.source = FakeWindowSource()
+        self.idle = FakeIdleDetector()
+        self.focus_map = FocusMap(tempfile.mkdtemp(dir=_TMP.name))
+        self.monitor = MonitorThread(source=self.source, idle=self.idle, focus_map=self.focus_map)
+        self.updates, self.episodes, self.idles, self.away = [], [], [], []
+        direct = Qt.ConnectionType.DirectConnection  # 测试中没有事件循环，信号直接在发出的线程里处理
+        self.monitor.update_signal.connect(lambda p, t, d, r: self.updates.append((t, d, r)), direct)
+        self.monitor.episode_signal.connect(lambda *e: self.episodes.append(e), direct)
+        self.monitor.idle_signal.connect(lambda s, e: self.idles.append((s, e)), direct)
+        self.monitor.away_signal.connect(lambda: self.away.append(time.time()), direct)
+        self.monitor.set_goal(*GOAL, profile=PROFILE)
+
+    def tearDown(self):
+        self.monitor.stop()
+        self.monitor.wait(5000)
+        CONFIG.config.clear()
+        CONFIG.config.update(self.saved)
+
+    def start(self, title, process):
+        self.source.push(title, process)
+        self.monitor.start()
+        self.monitor.resume()
+
+    def verdicts(self, title):
+        return [(d, r) for t, d, r in self.updates if t == title]
+
+    def test_distraction_waits_for_dwell_and_work_window_clears_it_at_once(self):
+        self.start("a.py - VS Code", "code")
+        self.assertTrue(wait_for(lambda: self.verdicts("a.py - VS Code")))
+        self.assertFalse(self.verdicts("a.py - VS Code")[0][0])
+
+        self.source.push("YouTube - cats", "chrome")
+        time.sleep(0.5)
+        self.assertEqual(self.verdicts("YouTube - cats"), [])  # 还没达到停留阈值
+        self.assertTrue(wait_for(lambda: self.verdicts("YouTube - cats")))
+        self.assertTrue(self.verdicts("YouTube - cats")[0][0])
+
+        switched = time.time()
+        self.source.push("b.py - VS Code", "code")
+        self.assertTrue(wait_for(lambda: self.verdicts("b.py - VS Code"), timeout=0.5))  # 画像匹配不等停留
+        self.assertFalse(self.verdicts("b.py - VS Code")[0][0])
+        self.assertTrue(wait_for(lambda: self.episodes))
+        process, _, _, start, end = self.episodes[0]
+        self.assertEqual(process, "chrome")
+        self.assertLessEqual(start, end)
+        self.assertLessEqual(end, switched + 0.5)
+
+    def test_idle_closes_episode_and_reports_away_span(self):
+        self.start("YouTube - cats", "chrome")
+        self.assertTrue(wait_for(lambda: self.verdicts("YouTube - cats")))
+
+        went_idle = time.time()
+        self.idle.set_idle(90)
+        self.source.push("YouTube - cats", "chrome")  # 唤醒采样
+        self.assertTrue(wait_for(lambda: self.away))
+        self.assertEqual(len(self.episodes), 1)  # 离开时结束分心片段
+        self.assertEqual(self.idles, [])
+        # 离开前发出、离开后才返回的判定被丢弃，不会重新打开片段
+        req = JudgeRequest(*GOAL, "YouTube - cats", "chrome", self.monitor.current_key, "")
+        self.monitor._on_verdict(req, (True, "late"), 1.0)
+        self.assertIsNone(self.monitor.episodes.open)
+
+        self.idle.touch()
+        self.assertTrue(wait_for(lambda: self.idles, timeout=3))
+        start, end = self.idles[0]
+        self.assertLessEqual(self.episodes[0][4], went_idle)  # 离开期间不计入分心
+        self.assertGreaterEqual(end - start, 89)
+
+    def assertNoOverlap(self):
+        spans = sorted((e[3], e[4]) for e in self.episodes)
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            self.assertGreaterEqual(start, end)
+
+    def test_episode_after_resume_starts_at_resume(self):
+        self.start("YouTube - cats", "chrome")
+        self.assertTrue(wait_for(lambda: self.verdicts("YouTube - cats")))
+        self.monitor.pause()
+        self.assertEqual(len(self.episodes), 1)
+        time.sleep(1.5)
+        resumed = time.time()
+        self.monitor.resume()
+        self.assertTrue(wait_for(lambda: len(self.verdicts("YouTube - cats")) >= 2))
+        self.source.push("a.py - VS Code", "code")  # 离开分心窗口，结束第二个片段
+        self.assertTrue(wait_for(lambda: len(self.episodes) >= 2))
+        self.assertGreaterEqual(self.episodes[1][3], resumed)  # 暂停时间不算分心
+        self.assertNoOverlap()
+        if NUMPY_AVAILABLE:
+            # 第二个片段不能覆盖 resume() 写入的暂停秒数
+            today = datetime.now().date()
+            self.assertGreaterEqual(self.focus_map.totals(today, today)["paused"], 1)
+
+    def test_episode_after_idle_starts_when_user_returns(self):
+        self.start("YouTube - cats", "chrome")
+        self.assertTrue(wait_for(lambda: self.verdicts("YouTube - cats")))
+        self.idle.set_idle(90)
+        self.source.push("YouTube - cats", "chrome")
+        self.assertTrue(wait_for(lambda: self.away))
+        time.sleep(2.5)
+        self.idle.touch()
+        self.assertTrue(wait_for(lambda: self.idles, timeout=3))
+        self.assertTrue(wait_for(lambda: len(self.verdicts("YouTube - cats")) >= 2))
+        self.source.push("a.py - VS Code", "code")
+        self.assertTrue(wait_for(lambda: len(self.episodes) >= 2))
+        self.assertGreaterEqual(self.episodes[1][3], self.idles[0][1])  # 离开期间不算分心
+        self.assertNoOverlap()
+        if NUMPY_AVAILABLE:
+            # 离开时段在状态图中保持为 IDLE，不被之后的分心片段覆盖
+            start, end = self.idles[0]
+            today = datetime.now().date()
+            self.assertGreaterEqual(self.focus_map.totals(today, today)["idle"], int(end - start) - 1)
+
+    def test_pause_stops_verdicts(self):
+        self.start("a.py - VS Code", "code")
+        self.assertTrue(wait_for(lambda: self.updates))
+        self.monitor.pause()
+        count = len(self.updates)
+        self.source.push("c.py - VS Code", "code")
+        time.sleep(0.5)
+        self.assertEqual(len(self.updates), count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.matcher import KeywordMatcher
+
+# 对比 judge 快速路径：逐个 `in` 子串测试 vs 编译后的 Aho-Corasick 匹配器
+TITLES = [
+    "(3) 周杰伦 - 晴天 MV - YouTube - Google Chrome",
+    "main.py - flowmate - Visual Studio Code",
+    "Pull requests · funpad/flowmate - GitHub",
+    "微信 (12条未读)",
+]
+
+
+def random_terms(n, seed=42):
+    rnd = random.Random(seed)
+    return ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 12))) for _ in range(n)]
+
+
+def naive(terms, txt):
+    for w in terms:
+        if w.lower() in txt: return w
+    return None
+
+
+def bench(n, number=2000):
+    terms = random_terms(n)
+    matcher = KeywordMatcher(terms)
+    texts = [t.lower() for t in TITLES]
+    t_naive = timeit.timeit(lambda: [naive(terms, t) for t in texts], number=number)
+    t_ac = timeit.timeit(lambda: [matcher.search(t) for t in texts], number=number)
+    per = number * len(texts)
+    print(f"{n:>6} terms | naive {t_naive / per * 1e6:8.2f} us | compiled {t_ac / per * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    for n in (10, 50, 200, 1000, 5000):
+        bench(n)
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.database import DatabaseManager
+from core.export import DATASETS, FORMATS
+from core.archive import ARCHIVED_DATASETS
+
+# flowmate.db 维护命令行：
+#   python tools/dbtool.py backfill            从原始记录重建汇总表
+#   python tools/dbtool.py export sessions --format csv --from 2025-01-01 -o sessions.csv
+#   python tools/dbtool.py archive             归档超过保留期的记录并整理数据库
+#   python tools/dbtool.py query-archive distractions --from 2024-01-01 --to 2024-03-31
+
+
+def cmd_backfill(db, args):
+    t = time.perf_counter()
+    n = db.rebuild_rollups()
+    print(f"Rebuilt rollups from {n} rows in {time.perf_counter() - t:.2f}s")
+
+
+def cmd_export(db, args):
+    t = time.perf_counter()
+    n = db.export(args.dataset, args.format, args.output, args.start, args.end)
+    # 导出到标准输出时统计信息写到 stderr，不混进数据
+    print(f"Exported {n} {args.dataset} rows in {time.perf_counter() - t:.2f}s", file=sys.stderr)
+
+
+def cmd_archive(db, args):
+    # 忽略 MAINTENANCE_INTERVAL 节流，立即执行并等待完成；旧库转换为增量 auto_vacuum 所需的完整 VACUUM 也只在这里执行
+    db.maintain(force=True).join()
+
+
+def cmd_query_archive(db, args):
+    n = 0
+    for row in db.query_archive(args.dataset, args.start, args.end):
+        print(json.dumps(row, ensure_ascii=False))
+        n += 1
+    print(f"Read {n} archived {args.dataset} rows", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FlowMate database tool")
+    parser.add_argument("--db", default="flowmate.db", help="数据库文件 (默认 flowmate.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="从 sessions/distraction_episodes/idle_periods 重建汇总表").set_defaults(func=cmd_backfill)
+    p = sub.add_parser("export", help="流式导出数据 (JSONL / CSV / Parquet)")
+    p.add_argument("dataset", choices=sorted(DATASETS))
+    p.add_argument("--format", choices=FORMATS, default="jsonl")
+    p.add_argument("--from", dest="start", type=date.fromisoformat, help="开始日期 YYYY-MM-DD (含)")
+    p.add_argument("--to", dest="end", type=date.fromisoformat, help="结束日期 YYYY-MM-DD (含)")
+    p.add_argument("-o", "--output", default="-", help="输出文件，默认标准输出 (parquet 必须指定文件)")
+    p.set_defaults(func=cmd_export)
+    sub.add_parser("archive", help="把超过 retention_days 的原始记录移入月度归档，并整理数据库").set_defaults(func=cmd_archive)
+    p = sub.add_parser("query-archive", help="从归档文件读取记录，输出 JSONL")
+    p.add_argument("dataset", choices=ARCHIVED_DATASETS)
+    p.add_argument("--from", dest="start", type=date.fromisoformat, help="开始日期 YYYY-MM-DD (含)")
+    p.add_argument("--to", dest="end", type=date.fromisoformat, help="结束日期 YYYY-MM-DD (含)")
+    p.set_defaults(func=cmd_query_archive)
+    args = parser.parse_args(argv)
+
+    # 打开时会自动执行 schema 迁移
+    db = DatabaseManager(args.db)
+    try:
+        args.func(db, args)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
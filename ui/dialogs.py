@@ -5,10 +5,11 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButto
                              QTableWidgetItem, QHeaderView, QTextBrowser, 
                              QFormLayout, QComboBox, QCheckBox, QSpinBox,
                              QWidget, QListWidget, QListWidgetItem, QAbstractItemView, QGridLayout, QApplication)
-from PyQt6.QtCore import Qt, QSize, QTimer, QPropertyAnimation, QParallelAnimationGroup, QSequentialAnimationGroup, QEasingCurve, QPoint  # <--- 加上动画相关组件
+from PyQt6.QtCore import Qt, QSize, QTimer, QPropertyAnimation, QParallelAnimationGroup, QSequentialAnimationGroup, QEasingCurve, QPoint, pyqtSignal  # <--- 加上动画相关组件
 from PyQt6.QtGui import QFont, QColor, QPainter
 from core.config import CONFIG
 from core.workers import ReportThread
+from core.rules import RULES
 from ui.styles import DIALOG_STYLE
 
 class BaseDialog(QDialog):
@@ -72,7 +73,7 @@ class SettingsDialog(BaseDialog):
 
     def initUI(self):
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
-        self.setFixedSize(400, 420)
+        self.setFixedSize(400, 470)
         self.setStyleSheet(DIALOG_STYLE)
 
         layout = QVBoxLayout()
@@ -111,10 +112,17 @@ class SettingsDialog(BaseDialog):
         self.strict_check = QCheckBox(" 开启教官模式 (强制专注)")
         self.strict_check.setStyleSheet("color: #AAA; font-size: 12px;")
 
+        # 在非必要应用上停留多久才提醒
+        self.dwell_spin = QSpinBox()
+        self.dwell_spin.setRange(0, 1800)
+        self.dwell_spin.setSingleStep(30)
+        self.dwell_spin.setSuffix(" 秒后提醒")
+
         form.addRow("服务商:", self.provider_input)
         form.addRow("API Key:", self.api_input)
         form.addRow("接口地址:", self.base_url_input)
         form.addRow("模型名称:", self.model_input)
+        form.addRow("分心容忍:", self.dwell_spin)
         form.addRow("", self.strict_check)
 
         layout.addLayout(form)
@@ -155,6 +163,7 @@ class SettingsDialog(BaseDialog):
         self.base_url_input.setText(saved_url)
         self.model_input.setCurrentText(CONFIG.get("model", "deepseek-chat"))
         self.strict_check.setChecked(CONFIG.get("strict_mode", False))
+        self.dwell_spin.setValue(int(CONFIG.get("alert_dwell_seconds")))
         
         # 尝试匹配 Provider
         found = False
@@ -171,6 +180,7 @@ class SettingsDialog(BaseDialog):
         CONFIG.save_config("base_url", self.base_url_input.text().strip())
         CONFIG.save_config("model", self.model_input.currentText().strip())
         CONFIG.save_config("strict_mode", self.strict_check.isChecked())
+        CONFIG.save_config("alert_dwell_seconds", self.dwell_spin.value())
         self.accept()
 
 # ================= 任务规划弹窗 (支持拖拽排序) =================
@@ -373,6 +383,9 @@ class PlanDialog(BaseDialog):
                 }
                 if 'id' in widget.data:
                     task_dict['id'] = widget.data['id']
+                # 预生成的画像只在步骤名未改动时保留
+                if widget.data.get('profile') and widget.data.get('step') == step_name:
+                    task_dict['profile'] = widget.data['profile']
                 new_tasks.append(task_dict)
         return new_tasks
 
@@ -531,6 +544,8 @@ class ReportDialog(BaseDialog):
         layout.addWidget(QLabel("📝 任务记录:"))
         self.table = QTableWidget(); self.table.setColumnCount(4); self.table.setHorizontalHeaderLabels(["任务", "时长", "状态", "分心"]); self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch); self.table.verticalHeader().setVisible(False); self.table.setFixedHeight(180)
         layout.addWidget(self.table)
+        self.week_lbl = QLabel(); self.week_lbl.setStyleSheet("color: #AAA;")
+        layout.addWidget(self.week_lbl)
         
         layout.addWidget(QLabel("🤖 AI 点评:"))
         self.box = QTextBrowser(); self.box.setHtml("<div style='color:#888;'>等待生成...</div>")
@@ -558,14 +573,110 @@ class ReportDialog(BaseDialog):
             self.table.setItem(i, 0, QTableWidgetItem(str(n))); self.table.setItem(i, 1, QTableWidgetItem(str(d))); self.table.setItem(i, 2, QTableWidgetItem(str(s)))
             item = QTableWidgetItem(str(dc)); item.setForeground(QColor("#FF5555") if dc > 0 else QColor("#4CAF50"))
             self.table.setItem(i, 3, item)
+        # 近 7 天趋势直接读汇总表
+        sessions, completed, focus, dists, dist_secs = self.db.get_range_summary(7)
+        self.week_lbl.setText(f"📈 近 7 天: 专注 {focus // 60} 分钟 · 完成 {completed}/{sessions} · 分心 {dists} 次 ({dist_secs // 60} 分钟)")
     def run_ai(self):
         self.btn.setDisabled(True); self.btn.setText("分析中..."); self.th = ReportThread(self.db); self.th.result_signal.connect(self.show); self.th.start()
     def show(self, txt):
         self.btn.setDisabled(False); self.btn.setText("重新生成"); self.box.setHtml(f"<div style='line-height:1.6; font-size:13px;'>{txt.replace(chr(10), '<br>')}</div>")
 
+# ================= 规则管理弹窗 =================
+
+class RulesDialog(BaseDialog):
+    """用户放行/屏蔽规则管理，规则保存后立即对监督生效"""
+    KIND_NAMES = {"process": "应用", "title": "标题"}
+    ACTION_NAMES = {"allow": "放行", "block": "屏蔽"}
+    SCOPE_NAMES = {"global": "全局", "goal": "当前目标", "step": "当前步骤"}
+
+    def __init__(self, main_goal="", step="", parent=None):
+        super().__init__(parent)
+        self.main_goal = main_goal
+        self.step = step
+        self.initUI()
+        self.load_rules()
+        self.center_on_parent()
+
+    def initUI(self):
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
+        self.setFixedSize(520, 520)
+        self.setStyleSheet(DIALOG_STYLE + """
+            QTableWidget { background: #2A2A3A; color: #EEE; border: none; border-radius: 6px; }
+            QHeaderView::section { background: #333; color: white; border: none; padding: 4px; }
+        """)
+        layout = QVBoxLayout(); layout.setContentsMargins(25, 25, 25, 25)
+        layout.setSpacing(12)
+
+        header = QHBoxLayout()
+        header.addWidget(QLabel("🛡️ 放行 / 屏蔽规则", styleSheet="font-size: 18px; font-weight: bold; color: #6C5CE7;"))
+        header.addStretch()
+        close = QPushButton("×")
+        close.setObjectName("CloseBtn")
+        close.setFixedSize(30, 30)
+        close.clicked.connect(self.accept)
+        header.addWidget(close)
+        layout.addLayout(header)
+
+        self.table = QTableWidget(); self.table.setColumnCount(5); self.table.setHorizontalHeaderLabels(["类型", "内容", "动作", "范围", ""])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch); self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        # 新增规则
+        add_row = QHBoxLayout(); add_row.setSpacing(8)
+        self.kind_input = QComboBox(); self.kind_input.addItems(list(self.KIND_NAMES.values()))
+        self.pattern_input = QLineEdit(); self.pattern_input.setPlaceholderText("进程名 / 标题片段 (网站填标题中的名字)")
+        self.action_input = QComboBox(); self.action_input.addItems(list(self.ACTION_NAMES.values()))
+        self.scope_input = QComboBox(); self.scope_input.addItems(list(self.SCOPE_NAMES.values()))
+        add_row.addWidget(self.kind_input); add_row.addWidget(self.pattern_input, 1)
+        add_row.addWidget(self.action_input); add_row.addWidget(self.scope_input)
+        layout.addLayout(add_row)
+
+        add_btn = QPushButton("＋ 添加规则")
+        add_btn.setMinimumHeight(40)
+        add_btn.clicked.connect(self.add_rule)
+        layout.addWidget(add_btn)
+        self.setLayout(layout)
+
+    def load_rules(self):
+        rules = RULES.list_rules()
+        self.table.setRowCount(len(rules))
+        for i, r in enumerate(rules):
+            self.table.setItem(i, 0, QTableWidgetItem(self.KIND_NAMES.get(r.kind, r.kind)))
+            self.table.setItem(i, 1, QTableWidgetItem(r.pattern))
+            item = QTableWidgetItem(self.ACTION_NAMES.get(r.action, r.action)); item.setForeground(QColor("#4CAF50") if r.action == "allow" else QColor("#FF5555"))
+            self.table.setItem(i, 2, item)
+            scope = self.SCOPE_NAMES.get(r.scope, r.scope) + (f": {r.scope_value}" if r.scope_value else "")
+            self.table.setItem(i, 3, QTableWidgetItem(scope))
+            del_btn = QPushButton("×"); del_btn.setObjectName("CloseBtn"); del_btn.setFixedSize(26, 26)
+            del_btn.clicked.connect(lambda _, rid=r.id: self.remove_rule(rid))
+            self.table.setCellWidget(i, 4, del_btn)
+        self.table.resizeColumnToContents(4)
+
+    def add_rule(self):
+        pattern = self.pattern_input.text().strip()
+        if not pattern: return
+        kind = list(self.KIND_NAMES)[self.kind_input.currentIndex()]
+        action = list(self.ACTION_NAMES)[self.action_input.currentIndex()]
+        scope = list(self.SCOPE_NAMES)[self.scope_input.currentIndex()]
+        scope_value = {"goal": self.main_goal, "step": self.step}.get(scope, "")
+        if scope != "global" and not scope_value:
+            from PyQt6.QtWidgets import QMessageBox
+            QMessageBox.warning(self, "提示", "当前没有进行中的任务，只能添加全局规则")
+            return
+        RULES.add_rule(kind, pattern, action, scope, scope_value)
+        self.pattern_input.clear()
+        self.load_rules()
+
+    def remove_rule(self, rule_id):
+        RULES.remove_rule(rule_id)
+        self.load_rules()
+
 # ================= 极简提醒弹窗 =================
 
 class Toast(QWidget):
+    allow_clicked = pyqtSignal()  # 用户点击"误判，放行"
+
     def __init__(self):
         super().__init__()
         # 强力置顶 Flags，但不抢夺焦点
@@ -592,6 +703,17 @@ class Toast(QWidget):
         self.lbl = QLabel("")
         self.lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.lbl)
+
+        # 一键放行：误判时点一下即可加入放行规则
+        self.allow_btn = QPushButton("👍 误判了，放行它")
+        self.allow_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.allow_btn.setStyleSheet("""
+            QPushButton { background: rgba(30, 30, 46, 0.9); color: #AAA; border: none; border-radius: 10px; padding: 4px 12px; font-size: 12px; }
+            QPushButton:hover { color: #4CAF50; }
+        """)
+        self.allow_btn.clicked.connect(self._on_allow)
+        self.allow_btn.hide()
+        layout.addWidget(self.allow_btn, 0, Qt.AlignmentFlag.AlignCenter)
         self.set_severity(False) # 默认黄色
         
         # 初始化定时器用于自动隐藏
@@ -620,7 +742,11 @@ class Toast(QWidget):
             border: 2px solid {accent_color};
         """)
 
-    def show_message(self, text, is_critical=False):
+    def _on_allow(self):
+        self.allow_btn.hide()
+        self.allow_clicked.emit()
+
+    def show_message(self, text, is_critical=False, allowable=False):
         """显示弹幕消息：采用更稳健的动画生命周期管理，解决红色弹幕可能停滞的问题"""
         # 如果当前正在显示动画，且新的请求不是紧急的，则跳过，避免动画冲突
         if self.is_animating and not is_critical:
@@ -635,6 +761,7 @@ class Toast(QWidget):
         self.is_animating = True
         self.set_severity(is_critical)
         self.lbl.setText(f"{text}")
+        self.allow_btn.setVisible(allowable)
         self.adjustSize()
         
         # 获取位置
@@ -8,10 +8,16 @@ from PyQt6.QtCore import Qt, QTimer, QUrl, QPropertyAnimation, QEasingCurve, QRe
 from PyQt6.QtGui import QFont, QCursor, QMovie, QIcon, QAction, QPixmap, QPainter, QColor, QPainterPath, QRegion
 from PyQt6.QtMultimedia import QSoundEffect
 from core.config import CONFIG, MOCK_MODE
+from core.client import CLIENTS
+from core.classifier import CLASSIFIER
+from core.rules import RULES, is_browser
+from core.titles import canonicalize
 from core.database import DatabaseManager
+from core.timeline import TimelineRecorder
+from core.focusmap import FocusMap
 from core.utils import check_assets
 from core.workers import PlannerThread, MonitorThread
-from ui.dialogs import SettingsDialog, PlanDialog, ReportDialog, Toast
+from ui.dialogs import SettingsDialog, PlanDialog, ReportDialog, RulesDialog, Toast
 from ui.styles import DIALOG_STYLE
 
 class FlowMate(QWidget):
@@ -24,7 +30,14 @@ class FlowMate(QWidget):
         self.current_index = -1
         self.state = "IDLE"
         self.main_goal = ""  # 存储用户输入的总目标
-        self.monitor = None
+        # 常驻监督服务，通过 set_goal / pause / resume 控制
+        self.monitor = MonitorThread(timeline=TimelineRecorder(self.db.log_spans), focus_map=FocusMap())
+        self.monitor.update_signal.connect(self.on_mon)
+        self.monitor.idle_signal.connect(self.on_idle)
+        self.monitor.episode_signal.connect(self.on_episode)
+        # 数据库归档/整理在后台线程中进行，只在用户离开座位时触发 (内部有节流)
+        self.monitor.away_signal.connect(lambda: self.db.maintain())
+        self.monitor.start()
 
         self.movie_focus = QMovie("assets/focus.gif")
         self.movie_break = QMovie("assets/break.gif")
@@ -32,6 +45,8 @@ class FlowMate(QWidget):
         for m in [self.movie_focus, self.movie_break, self.movie_alert]: m.setCacheMode(QMovie.CacheMode.CacheAll)
         self.tray_icon = None # 确保在init_tray之前初始化
         self.toast = Toast()  # 初始化极简提醒
+        self.toast.allow_clicked.connect(self.allow_current)
+        self.last_distraction = None  # 最近一次被判为分心的 (进程名, 窗口标题)，用于一键放行
         self.show_toast = True # 弹幕开关
         self.last_audio_time = 0  # 声音节流锁
         # 滑动窗口：记录最近1分钟内的注意力分散事件
@@ -302,19 +317,31 @@ class FlowMate(QWidget):
 
         menu.addSeparator()
 
-        # 6. 弹幕开关
+        # 6. 一键放行 / 规则管理
+        self.action_allow = QAction("👍 放行当前应用", self)
+        self.action_allow.triggered.connect(self.allow_current)
+        self.action_allow.setEnabled(False)
+        menu.addAction(self.action_allow)
+
+        action_rules = QAction("🛡️ 放行/屏蔽规则", self)
+        action_rules.triggered.connect(self.open_rules)
+        menu.addAction(action_rules)
+
+        menu.addSeparator()
+
+        # 7. 弹幕开关
         self.action_toast = QAction("👁️ 显示弹幕", self)
         self.action_toast.setCheckable(True)
         self.action_toast.setChecked(True)
         self.action_toast.toggled.connect(self.toggle_toast_cfg)
         menu.addAction(self.action_toast)
 
-        # 7. 设置
+        # 8. 设置
         action_settings = QAction("⚙️ 设置", self)
         action_settings.triggered.connect(self.open_set)
         menu.addAction(action_settings)
         
-        # 8. 退出
+        # 9. 退出
         action_quit = QAction("❌ 退出程序", self)
         action_quit.triggered.connect(self.quit_app)
         menu.addAction(action_quit)
@@ -375,6 +402,7 @@ class FlowMate(QWidget):
                 # 同步显示标题和步骤
                 if self.state == "FOCUS":
                     self.task_lbl.setText(new_t['step'])
+                    self.monitor.set_goal(self.main_goal, new_t['step'], new_t.get('profile'))  # 步骤改名后按新名称监督
                 self.step_lbl.setText(f"Step {self.current_index+1}/{len(self.task_queue)}")
                 self.update_tm()
             else:
@@ -387,9 +415,7 @@ class FlowMate(QWidget):
                     return
                 
                 # 当前任务既然没了，我们结束旧 Session
-                if self.current_session_id:
-                    self.db.end_session(self.current_session_id, "DELETED")
-                    self.current_session_id = None
+                self.finish_session("DELETED")
                 
                 # 尝试加载后续任务 (当前的 index 对应新队列里的下一个)
                 if self.current_index >= len(self.task_queue):
@@ -403,6 +429,30 @@ class FlowMate(QWidget):
         
         # 不自动显示主窗口，保持后台运行
 
+    def current_step(self):
+        return self.task_queue[self.current_index].get('step', "") if 0 <= self.current_index < len(self.task_queue) else ""
+
+    def allow_current(self):
+        """一键放行最近一次被判为分心的应用：加入放行规则，并作为纠正样本喂给本地分类器"""
+        if not self.last_distraction: return
+        p, t = self.last_distraction
+        step = self.current_step()
+        canon = canonicalize(t, p)
+        if is_browser(p):
+            # 浏览器不能整体放行，只放行当前页面 (限当前步骤)
+            rule = RULES.add_rule("title", canon, "allow", "step" if step else "global", step)
+        else:
+            rule = RULES.add_rule("process", p, "allow")
+        CLASSIFIER.learn(step, canon, p, False, weight=5.0)
+        self.last_distraction = None
+        self.action_allow.setEnabled(False)
+        self.distraction_history = []
+        self.task_lbl.setText(f"👍 已放行 {rule.pattern}")
+        QTimer.singleShot(1500, lambda: self.task_lbl.setText(self.current_step() or "准备就绪"))
+
+    def open_rules(self):
+        RulesDialog(self.main_goal, self.current_step(), self).exec()
+
     def toggle_toast_cfg(self, checked):
         self.show_toast = checked
         if not checked: self.toast.hide()
@@ -432,7 +482,7 @@ class FlowMate(QWidget):
         self.action_task_pause.setChecked(checked) # 同步托盘菜单
         
         if self.task_paused:
-            if self.monitor: self.monitor.stop()
+            self.monitor.pause()
             txt = "休息" if self.state == "BREAK" else "任务"
             self.task_lbl.setText(f"⏸️ {txt}已暂停")
             self.btn_ps.setText("▶️ 继续")
@@ -456,7 +506,7 @@ class FlowMate(QWidget):
         self.action_sup_pause.setChecked(checked) # 同步托盘菜单
         
         if self.supervision_paused:
-            if self.monitor: self.monitor.stop()
+            self.monitor.pause()
             if not self.task_paused: self.task_lbl.setText("💤 监督暂停中")
             self.action_sup_pause.setText("▶️ 恢复监督")
         else:
@@ -465,17 +515,15 @@ class FlowMate(QWidget):
 
     def refresh_monitor_state(self):
         """根据当前状态决定是否启动监督"""
-        if self.monitor: self.monitor.stop()
-        
         if self.state == "FOCUS" and self.task_queue and not self.task_paused and not self.supervision_paused:
-            step = self.task_queue[self.current_index].get('step', "Work")
+            t = self.task_queue[self.current_index]
+            step = t.get('step', "Work")
             self.task_lbl.setText(step)
-            self.monitor = MonitorThread(self.main_goal, step)
-            self.monitor.update_signal.connect(self.on_mon)
-            self.monitor.start()
-        elif self.state == "FOCUS" and (self.task_paused or self.supervision_paused):
+            self.monitor.set_goal(self.main_goal, step, t.get('profile'))
+            self.monitor.resume()
+        else:
             # 保持当前步骤文本，除非已经被设置了暂停文案
-            pass
+            self.monitor.pause()
 
     # ================= 关闭拦截 =================
     def closeEvent(self, event):
@@ -488,7 +536,9 @@ class FlowMate(QWidget):
 
     def quit_app(self):
         """【修复点 2】使用导入后的 QApplication 退出"""
-        if self.monitor: self.monitor.stop()
+        self.monitor.close_episode()  # 正在进行的分心片段先写入
+        self.monitor.stop(); self.monitor.wait(2000)
+        self.db.close()  # 提交写队列中剩余的记录
         self.tray_icon.hide()
         QApplication.quit()
 
@@ -510,7 +560,7 @@ class FlowMate(QWidget):
 
     def open_set(self): 
         if SettingsDialog(self).exec(): 
-            if self.monitor: self.monitor.ai.reload_client()
+            CLIENTS.reload()  # 共享 client 原子替换，所有线程下一次请求即生效
             self.task_lbl.setText("✅ 已更新"); QTimer.singleShot(1000, lambda: self.task_lbl.setText(self.task_queue[self.current_index]['step'] if self.task_queue else "准备就绪"))
 
     def plan(self):
@@ -582,25 +632,30 @@ class FlowMate(QWidget):
         self.update_tm()
         self.set_state("FOCUS")
         
-        if self.monitor: self.monitor.stop()
-        self.monitor = MonitorThread(self.main_goal, t['step'])
-        self.monitor.update_signal.connect(self.on_mon); self.monitor.start(); self.timer.start(1000)
+        self.monitor.set_goal(self.main_goal, t['step'], t.get('profile')); self.monitor.resume(); self.timer.start(1000)
 
     def start_break(self):
-        if self.current_session_id: self.db.end_session(self.current_session_id, "COMPLETED"); self.current_session_id = None
+        self.finish_session("COMPLETED")
         
         # 播放成功音效
         self.success_sound.play()
         
         self.state = "BREAK"; t = self.task_queue[self.current_index]; self.duration = t.get('break', 5) * 60
-        if self.monitor: self.monitor.stop()
+        self.monitor.pause()
         self.task_lbl.setText("☕ 休息时间"); self.update_tm(); self.set_state("BREAK"); self.toggle_ui(False)
 
     def abandon(self):
         # 无需二次确认，直接放弃
-        if self.current_session_id: self.db.end_session(self.current_session_id, "ABANDONED")
+        self.finish_session("ABANDONED")
         self.reset(); self.task_lbl.setText("🚫 已放弃"); self.set_state("ALERT"); QTimer.singleShot(1500, lambda: self.set_state("FOCUS"))
 
+    def finish_session(self, status):
+        """结束当前会话：先结算未结束的分心片段，再写入会话状态"""
+        if not self.current_session_id: return
+        self.monitor.close_episode()
+        self.db.end_session(self.current_session_id, status)
+        self.current_session_id = None
+
     def next(self):
         if self.state == "FOCUS": self.start_break()
         elif self.state == "BREAK": self.load_next()
@@ -615,9 +670,10 @@ class FlowMate(QWidget):
         self.action_task_pause.setEnabled(False); self.action_task_pause.setChecked(False); self.action_task_pause.setText("⏸️ 暂停任务")
         self.action_sup_pause.setEnabled(False); self.action_sup_pause.setChecked(False); self.action_sup_pause.setText("💤 暂停监督")
         self.action_abandon.setEnabled(False) # 禁用放弃
+        self.action_allow.setEnabled(False); self.last_distraction = None
         self.tray_icon.setIcon(QIcon("assets/tray_idle.png")) # 恢复就绪图标
         self.tray_icon.setToolTip("FlowMate - Ready")
-        if self.monitor: self.monitor.stop()
+        self.monitor.pause()
         self.timer.stop(); self.toggle_ui(True); self.set_state("FOCUS")
         self.progress_bar.setValue(0); self.progress_bar.hide()
         # 清空滑动窗口记录
@@ -689,6 +745,8 @@ class FlowMate(QWidget):
         now = time.time()
         
         if d:
+            self.last_distraction = (p, t)
+            self.action_allow.setEnabled(True)
             # 记录分散事件到滑动窗口
             self.distraction_history.append((now, r))
             # 清理1分钟之前的历史记录
@@ -704,22 +762,29 @@ class FlowMate(QWidget):
                 if not self.toast.isVisible() or (is_critical and not getattr(self, '_last_was_critical', False)):
                     display_reason = r[:30] + "..." if len(r) > 30 else r
                     message = f"⚠️ {display_reason}" if display_reason else "⚠️ 注意力分散"
-                    self.toast.show_message(message, is_critical=is_critical)
+                    self.toast.show_message(message, is_critical=is_critical, allowable=True)
                     self._last_was_critical = is_critical
             
             # 播放提示音 (每5秒最多一次)
             if now - self.last_audio_time > 5:
                 self.alert_sound.play()
                 self.last_audio_time = now
-
-            if self.current_session_id and int(now)%5==0: 
-                self.db.log_distraction(self.current_session_id, p, r)
         else:
             # 专注回去后不强制隐藏，让弹幕自然完成动画
             # self.toast.hide() # 移除强制隐藏，让弹幕自然飞出
             if self.avatar_bg.movie() != self.movie_focus: self.set_state("FOCUS")
             self.task_lbl.setText(self.task_queue[self.current_index]['step'])
 
+    def on_episode(self, p, title, r, start, end):
+        # 一次连续分心只写一行 (监督线程在离开该窗口/暂停/离开座位时结束片段)
+        if self.current_session_id:
+            self.db.log_episode(self.current_session_id, p, title, r, start, end)
+
+    def on_idle(self, start, end):
+        # 只有专注时监督线程才会检测离开，休息/暂停期间不会收到
+        if self.current_session_id:
+            self.db.log_idle(self.current_session_id, start, end)
+
     def mousePressEvent(self, e): 
         if e.button() == Qt.MouseButton.LeftButton: self.drag_pos = e.globalPosition().toPoint() - self.frameGeometry().topLeft(); e.accept()
     def mouseMoveEvent(self, e): 